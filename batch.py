@@ -0,0 +1,163 @@
+"""
+Vectorized batch simulator.
+
+Runs N independent games in lockstep with NumPy: the boards live in one
+(N, rows, columns) uint8 array of color ids and the falling pieces in one
+state vector per board, so every tick is a handful of array operations
+whatever the batch size. Boards that top out are reset automatically.
+
+Each step is one gravity tick, like TetrisEngine.step(action) with the
+default dt, using the same actions, piece table and scoring.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from engine import PIECES, COLUMNS, ROWS, POINTS_PER_ROW, LEFT, RIGHT, DOWN, ROTATE, HARD_DROP
+
+# ------------------------- Piece Tables ------------------------- #
+# CELLS[shape, rotation] holds the four (dx, dy) cell offsets; shapes with
+# fewer than four rotations repeat them so any rotation index is valid.
+MAX_ROTATIONS = max(len(shape.rotations) for shape in PIECES)
+CELLS = np.array([[shape.rotations[r % len(shape.rotations)].cells
+                   for r in range(MAX_ROTATIONS)] for shape in PIECES], dtype=np.int64)
+ROTATION_COUNT = np.array([len(shape.rotations) for shape in PIECES], dtype=np.int64)
+SPAWN = np.array([shape.spawn for shape in PIECES], dtype=np.int64)
+
+# Columns of the per-board piece state vector
+SHAPE, ROTATION, X, Y = range(4)
+
+
+class BatchStep(namedtuple('BatchStep', 'locked cleared game_over final_score')):
+    """
+    Per-board outcome of one tick: whether the piece locked, rows cleared,
+    whether the game ended (and was reset), and the score it ended with
+    (only meaningful where game_over is set).
+    """
+    __slots__ = ()
+
+
+class BatchSimulator:
+    def __init__(self, n, seed=None, width=COLUMNS, height=ROWS):
+        self.n = n
+        self.width = width
+        self.height = height
+        self.rng = np.random.default_rng(seed)
+        self.boards = np.zeros((n, height, width), dtype=np.uint8)
+        self.state = np.zeros((n, 4), dtype=np.int64)
+        self.next_shape = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.lines = np.zeros(n, dtype=np.int64)
+        self.pieces = np.zeros(n, dtype=np.int64)
+        self.games = 0  # games finished so far
+        self._all = np.arange(n)
+        self.reset()
+
+    def reset(self, which=None):
+        """Starts new games on the boards selected by which (all by default)."""
+        if which is None:
+            which = self._all
+        self.boards[which] = 0
+        self.score[which] = 0
+        self.lines[which] = 0
+        self.pieces[which] = 0
+        self._spawn(which, self.rng.integers(0, len(PIECES), len(which)))
+        self.next_shape[which] = self.rng.integers(0, len(PIECES), len(which))
+
+    def _spawn(self, which, shapes):
+        self.state[which, SHAPE] = shapes
+        self.state[which, ROTATION] = 0
+        self.state[which, X] = SPAWN[shapes, 0] + (self.width - COLUMNS) // 2  # see engine.spawn_position
+        self.state[which, Y] = SPAWN[shapes, 1]
+
+    def collides(self, which, shape, rotation, x, y):
+        """
+        Vectorized Board.collides: True where the piece overlaps a wall,
+        the floor or a locked cell of its board.
+        """
+        cells = CELLS[shape, rotation]
+        xs = x[:, None] + cells[..., 0]
+        ys = y[:, None] + cells[..., 1]
+        outside = (xs < 0) | (xs >= self.width) | (ys >= self.height)
+        occupied = self.boards[which[:, None],
+                               np.clip(ys, 0, self.height - 1),
+                               np.clip(xs, 0, self.width - 1)] != 0
+        return (outside | ((ys >= 0) & occupied)).any(axis=1)
+
+    def step(self, actions):
+        """Applies one action per board, then one gravity tick to all boards."""
+        actions = np.asarray(actions)
+        shape, rotation, x, y = self.state.T
+
+        # Movement and rotation, reverted where they collide
+        nx = x - (actions == LEFT) + (actions == RIGHT)
+        ny = y + (actions == DOWN)
+        nrot = np.where(actions == ROTATE, (rotation + 1) % ROTATION_COUNT[shape], rotation)
+        ok = ~self.collides(self._all, shape, nrot, nx, ny)
+        x = np.where(ok, nx, x)
+        y = np.where(ok, ny, y)
+        rotation = np.where(ok, nrot, rotation)
+
+        # Hard drops fall a row at a time until all have landed; gravity
+        # below then locks them, as the engine does straight away
+        drop = np.flatnonzero(actions == HARD_DROP)
+        while len(drop):
+            drop = drop[~self.collides(drop, shape[drop], rotation[drop], x[drop], y[drop] + 1)]
+            y[drop] += 1
+
+        # Gravity
+        locked = self.collides(self._all, shape, rotation, x, y + 1)
+        y = np.where(locked, y, y + 1)
+        self.state[:, ROTATION] = rotation
+        self.state[:, X] = x
+        self.state[:, Y] = y
+
+        cleared = np.zeros(self.n, dtype=np.int64)
+        game_over = np.zeros(self.n, dtype=bool)
+        final_score = self.score.copy()
+        which = np.flatnonzero(locked)
+        if len(which):
+            cleared[which], lost = self._lock(which)
+            final_score[which] = self.score[which]
+            ended = which[lost]
+            if len(ended):
+                game_over[ended] = True
+                self.games += len(ended)
+                self.reset(ended)
+        return BatchStep(locked, cleared, game_over, final_score)
+
+    def _lock(self, which):
+        """Locks the pieces of the given boards, clears full rows and spawns."""
+        shape, rotation, x, y = self.state[which].T
+        cells = CELLS[shape, rotation]
+        xs = x[:, None] + cells[..., 0]
+        ys = y[:, None] + cells[..., 1]
+        visible = ys >= 0
+        board_index = np.broadcast_to(which[:, None], xs.shape)
+        colors = np.broadcast_to((shape + 1)[:, None], xs.shape)
+        self.boards[board_index[visible], ys[visible], xs[visible]] = colors[visible]
+
+        # Full rows move to the top (stable sort keeps the others in
+        # order) and are emptied there.
+        boards = self.boards[which]
+        full = (boards != 0).all(axis=2)
+        cleared = full.sum(axis=1)
+        if cleared.any():
+            order = np.argsort(~full, axis=1, kind='stable')
+            boards = np.take_along_axis(boards, order[:, :, None], axis=1)
+            boards[np.arange(self.height)[None, :] < cleared[:, None]] = 0
+            self.boards[which] = boards
+
+        # Cells that were above the board move down with the rows, as in
+        # engine.Board.clear_rows; a cell left in the top row or above loses
+        ys = ys + cleared[:, None]
+        shifted = ~visible & (ys >= 0)
+        self.boards[board_index[shifted], ys[shifted], xs[shifted]] = colors[shifted]
+        lost = (ys < 0).any(axis=1) | (self.boards[which, 0] != 0).any(axis=1)
+
+        self.score[which] += cleared * POINTS_PER_ROW
+        self.lines[which] += cleared
+        self.pieces[which] += 1
+        self._spawn(which, self.next_shape[which])
+        self.next_shape[which] = self.rng.integers(0, len(PIECES), len(which))
+        return cleared, lost
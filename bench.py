@@ -0,0 +1,239 @@
+"""
+Benchmark suite.
+
+Times the hot paths of the engine and the renderer without a display
+(SDL's dummy video driver), so it runs on CI machines:
+
+    python bench.py                                  # run everything
+    python bench.py -k clear_rows                    # only matching cases
+    python bench.py --save bench_baseline.json       # record a baseline
+    python bench.py --compare bench_baseline.json    # exit 1 on a regression
+
+Each case is calibrated to run for at least --min-time seconds per repeat;
+the reported figure is the median time per call over --repeat repeats.
+A comparison fails when a case is slower than its baseline by more than
+--threshold (a fraction, default 0.15).
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+import pygame
+
+import tetris
+from engine import TetrisEngine, Board, Piece, PIECES, NOOP, LEFT, RIGHT, DOWN, ROTATE, \
+    convert_shape_format, valid_space
+from solver import Solver
+
+DEFAULT_THRESHOLD = 0.15
+
+# ------------------------- Boards ------------------------- #
+def fill_row(board, y, rng, holes=0):
+    """Fills row y with random colors, leaving the given number of holes."""
+    empty = set(rng.sample(range(board.width), holes))
+    for x in range(board.width):
+        if x not in empty:
+            board.rows[y] |= 1 << x
+            board.colors[y] |= rng.randint(1, len(PIECES)) << (3 * x)
+
+def typical_board(rng):
+    """A mid-game stack: eight rows with a few holes each, nothing to clear."""
+    board = Board()
+    for y in range(board.height - 8, board.height):
+        fill_row(board, y, rng, holes=rng.randint(1, 3))
+    return board
+
+def near_full_board(rng):
+    """Stacked to the top, every row one cell short, and a tetris at the bottom."""
+    board = Board()
+    for y in range(2, board.height):
+        fill_row(board, y, rng, holes=0 if y >= board.height - 4 else 1)
+    return board
+
+def full_board(rng):
+    """Pathological: every row is full."""
+    board = Board()
+    for y in range(board.height):
+        fill_row(board, y, rng)
+    return board
+
+def alternating_board(rng):
+    """Pathological: full and one-short rows alternate, so every clear shifts."""
+    board = Board()
+    for y in range(board.height):
+        fill_row(board, y, rng, holes=y % 2)
+    return board
+
+def marathon_board(rng):
+    """Stress test: a 100x200 board stacked 80 rows deep with a few holes per row."""
+    board = Board(100, 200)
+    for y in range(board.height - 80, board.height):
+        fill_row(board, y, rng, holes=rng.randint(1, 5))
+    return board
+
+BOARDS = {
+    "typical": typical_board,
+    "near_full": near_full_board,
+    "full": full_board,
+    "alternating": alternating_board,
+    "100x200": marathon_board,
+}
+
+# ------------------------- Cases ------------------------- #
+def cases():
+    """Returns the (name, function) benchmark cases, functions taking no arguments."""
+    rng = random.Random(0)
+    boards = {name: build(rng) for name, build in BOARDS.items()}
+    for board in boards.values():
+        board.update_heights()  # the builders edit rows directly
+    engine = TetrisEngine("Medium", seed=0)
+    empty = Board()
+    piece = Piece(5, 4, next(i for i, shape in enumerate(PIECES) if shape.name == "T"))
+    wide_piece = Piece(50, 100, piece.index)
+    lookahead = [piece, engine.next_piece]
+    win = tetris.create_window()
+    grid = tetris.create_grid(boards["typical"])
+
+    def clear(board, ys):
+        def run():
+            board.copy().clear_rows(ys)
+        return run
+
+    def frame():
+        """One game frame: an input, a simulation tick and an incremental draw."""
+        action = actions[frame.count % len(actions)]
+        frame.count += 1
+        if action != NOOP:
+            engine.step(action, 0)
+        if engine.step(NOOP, tetris.SIM_TICK_MS).game_over:
+            engine.reset(frame.count)
+        renderer.draw(tetris.compose_grid(engine), engine.score, 0, engine.next_piece)
+        renderer.present()
+    frame.count = 0
+    actions = [rng.choice([NOOP] * 6 + [LEFT, RIGHT, DOWN, ROTATE]) for _ in range(997)]
+    renderer = tetris.Renderer(win)
+
+    result = [
+        ("create_grid/empty", lambda: tetris.create_grid(empty)),
+        ("create_grid/typical", lambda: tetris.create_grid(boards["typical"])),
+        ("create_grid/full", lambda: tetris.create_grid(boards["full"])),
+        ("create_grid/100x200", lambda: tetris.create_grid(boards["100x200"])),
+        ("valid_space", lambda: valid_space(piece, boards["typical"])),
+        ("valid_space/100x200", lambda: valid_space(wide_piece, boards["100x200"])),
+        ("convert_shape_format", lambda: convert_shape_format(piece)),
+        ("drop_distance", lambda: boards["typical"].drop_distance(piece)),
+        ("Board.copy", lambda: boards["typical"].copy()),
+        # A fresh solver each call, so nothing comes from its transposition table
+        ("Solver.best", lambda: Solver(deadline_ms=None).best(boards["typical"], lookahead)),
+    ]
+    # clear_rows mutates, so each call works on a copy (see Board.copy above).
+    # Like the engine, it tests only the rows of the piece just locked: here
+    # a vertical I in the bottom four rows.
+    result += [("clear_rows/" + name, clear(board, range(board.height - 4, board.height)))
+               for name, board in boards.items()]
+    result += [
+        ("draw_window", lambda: tetris.draw_window(win, grid, 1230, 4560)),
+        ("draw_next_shape", lambda: tetris.draw_next_shape(engine.next_piece, win)),
+        ("frame", frame),
+    ]
+    return result
+
+# ------------------------- Timing ------------------------- #
+def measure(function, repeat=5, min_time=0.1):
+    """
+    Calibrates a loop count so one repeat takes at least min_time seconds,
+    then returns the per-call times (seconds) of each repeat.
+    """
+    loops = 1
+    while True:
+        elapsed = _time(function, loops)
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed < min_time / 10 else max(2, int(min_time / max(elapsed, 1e-9)) + 1)
+    return [_time(function, loops) / loops for _ in range(repeat)]
+
+def _time(function, loops):
+    start = time.perf_counter()
+    for _ in range(loops):
+        function()
+    return time.perf_counter() - start
+
+def run(pattern=None, repeat=5, min_time=0.1):
+    """Runs the matching cases and returns {name: {"median_us", "min_us", "stdev_us"}}."""
+    results = {}
+    for name, function in cases():
+        if pattern and pattern not in name:
+            continue
+        times = measure(function, repeat, min_time)
+        results[name] = {
+            "median_us": round(statistics.median(times) * 1e6, 3),
+            "min_us": round(min(times) * 1e6, 3),
+            "stdev_us": round(statistics.pstdev(times) * 1e6, 3),
+        }
+        print(f"{name:<26} {results[name]['median_us']:>12.3f} us  (min {results[name]['min_us']:.3f})")
+    return results
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Prints each case against the baseline and returns the names of the
+    cases that got slower by more than threshold.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<26} (not in baseline)")
+            continue
+        change = result["median_us"] / base["median_us"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<26} {base['median_us']:>12.3f} -> {result['median_us']:>12.3f} us  {change:+7.1%}{flag}")
+    return regressions
+
+# ------------------------- Command Line ------------------------- #
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the game's hot paths headlessly.")
+    parser.add_argument("-k", dest="pattern", help="only run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.1, help="seconds per repeat (default 0.1)")
+    parser.add_argument("--save", metavar="FILE", help="write the results as a baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"allowed slowdown before a case fails (default {DEFAULT_THRESHOLD})")
+    args = parser.parse_args(argv)
+
+    results = run(args.pattern, args.repeat, args.min_time)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "pygame": pygame.version.ver,
+                "machine": platform.machine(),
+                "results": results,
+            }, f, indent=2)
+        print(f"baseline -> {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        print()
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} case(s) regressed by more than {args.threshold:.0%}: "
+                  + ", ".join(regressions))
+            return 1
+        print(f"no case regressed by more than {args.threshold:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
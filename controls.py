@@ -0,0 +1,81 @@
+"""
+Held-key auto-repeat.
+
+A move is applied once when its key goes down. If the key is still held
+after the delayed auto-shift (DAS) it repeats every auto-repeat rate (ARR)
+ms. Both are measured from the presses' timestamps, not in frames, so
+repeats come at the same rate whatever the frame rate, each stamped with
+the moment it was due. An interval of 0 slides instantly: the repeat is
+due once, and the caller moves the piece as far as it goes (slides()):
+
+    repeat = AutoRepeat({LEFT: (170, 50), RIGHT: (170, 50), DOWN: (50, 50)})
+    repeat.press(LEFT, now)           # the caller applies the first move itself
+    for action, due in repeat.due(now):
+        ...                           # apply each repeat
+    repeat.release(LEFT, now)
+
+Left and right cancel each other: the direction pressed last wins, the way
+most players expect when rolling from one key to the other. It does not
+depend on pygame.
+"""
+import math
+
+from engine import LEFT, RIGHT
+
+DAS_MS = 170
+ARR_MS = 50
+SOFT_DROP_MS = 50   # soft drop repeats at this rate, with no extra delay
+MAX_REPEATS = 64    # per action and call to due(), after a stall
+
+
+class AutoRepeat:
+    def __init__(self, rates):
+        self.rates = rates  # action -> (delay, interval) in ms
+        self.held = {}      # action -> time its next repeat is due (inf: none until pressed again)
+
+    def press(self, action, now):
+        """Starts repeating action (if it repeats) after its delay."""
+        rate = self.rates.get(action)
+        if rate is None:
+            return
+        if action in (LEFT, RIGHT):
+            self.held.pop(RIGHT if action == LEFT else LEFT, None)
+        self.held[action] = now + rate[0]
+
+    def release(self, action, now):
+        self.held.pop(action, None)
+
+    def clear(self):
+        """Forgets every held key, e.g. after a pause in which releases were not seen."""
+        self.held.clear()
+
+    def slides(self, action):
+        """True if the action repeats with no interval, all the way at once."""
+        return self.rates[action][1] == 0
+
+    def next_due(self):
+        """Returns when the next repeat is due, or None if no key repeats."""
+        next_time = min(self.held.values(), default=math.inf)
+        return None if next_time == math.inf else next_time
+
+    def due(self, now):
+        """Returns the (action, due time) repeats due by now, in time order."""
+        repeats = []
+        for action, next_time in self.held.items():
+            interval = self.rates[action][1]
+            if interval == 0:
+                # One slide per press
+                if next_time <= now:
+                    repeats.append((action, next_time))
+                    self.held[action] = math.inf
+                continue
+            count = 0
+            while next_time <= now and count < MAX_REPEATS:
+                repeats.append((action, next_time))
+                next_time += interval
+                count += 1
+            if next_time <= now:
+                next_time = now + interval  # skip what a stall left behind
+            self.held[action] = next_time
+        repeats.sort(key=lambda r: r[1])
+        return repeats
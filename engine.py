@@ -0,0 +1,637 @@
+"""
+Headless Tetris engine.
+
+Holds the game rules (board, current/next piece, score and fall-speed
+schedule) without touching pygame, so games can be simulated on servers
+without a display. The pygame UI in tetris.py runs on top of it.
+"""
+import hashlib
+import random
+import struct
+from collections import namedtuple
+
+# ------------------------- Board & Difficulty ------------------------- #
+COLUMNS = 10
+ROWS = 20
+
+# Difficulty levels determine the starting fall speed (seconds per row):
+DIFFICULTY_SPEED = {
+    "Easy": 0.35,
+    "Medium": 0.27,
+    "Hard": 0.18
+}
+
+# Every SPEED_UP_INTERVAL ms the fall speed drops by SPEED_UP_STEP,
+# until it reaches MIN_FALL_SPEED.
+SPEED_UP_INTERVAL = 5000
+SPEED_UP_STEP = 0.005
+MIN_FALL_SPEED = 0.12
+
+POINTS_PER_ROW = 10
+
+# ------------------------- Tetris Shapes ------------------------- #
+S = [['.....',
+      '.....',
+      '..00.',
+      '.00..',
+      '.....'],
+     ['.....',
+      '..0..',
+      '..00.',
+      '...0.',
+      '.....']]
+
+Z = [['.....',
+      '.....',
+      '.00..',
+      '..00.',
+      '.....'],
+     ['.....',
+      '..0..',
+      '.00..',
+      '.0...',
+      '.....']]
+
+I = [['..0..',
+      '..0..',
+      '..0..',
+      '..0..',
+      '.....'],
+     ['.....',
+      '0000.',
+      '.....',
+      '.....',
+      '.....']]
+
+O = [['.....',
+      '.....',
+      '.00..',
+      '.00..',
+      '.....']]
+
+J = [['.....',
+      '.0...',
+      '.000.',
+      '.....',
+      '.....'],
+     ['.....',
+      '..00.',
+      '..0..',
+      '..0..',
+      '.....'],
+     ['.....',
+      '.....',
+      '.000.',
+      '...0.',
+      '.....'],
+     ['.....',
+      '..0..',
+      '..0..',
+      '.00..',
+      '.....']]
+
+L = [['.....',
+      '...0.',
+      '.000.',
+      '.....',
+      '.....'],
+     ['.....',
+      '..0..',
+      '..0..',
+      '..00.',
+      '.....'],
+     ['.....',
+      '.....',
+      '.000.',
+      '.0...',
+      '.....'],
+     ['.....',
+      '.00..',
+      '..0..',
+      '..0..',
+      '.....']]
+
+T = [['.....',
+      '..0..',
+      '.000.',
+      '.....',
+      '.....'],
+     ['.....',
+      '..0..',
+      '..00.',
+      '..0..',
+      '.....'],
+     ['.....',
+      '.....',
+      '.000.',
+      '..0..',
+      '.....'],
+     ['.....',
+      '..0..',
+      '.00..',
+      '..0..',
+      '.....']]
+
+shapes = [S, Z, I, O, J, L, T]
+
+# ------------------------- Actions ------------------------- #
+NOOP, LEFT, RIGHT, DOWN, ROTATE, HARD_DROP = range(6)
+
+# ------------------------- Piece Table ------------------------- #
+# The string templates above are compiled once at load time; nothing
+# parses them while a game is running.
+SPAWN_POSITION = (5, 0)
+
+# One rotation of a shape. cells are (dx, dy) offsets from the piece
+# position; left/right/top/bottom bound them; masks holds (dy, mask) per
+# occupied row, with bit 0 of mask at column offset left; columns holds
+# (dx, dy) of the lowest cell in each occupied column.
+PieceRotation = namedtuple('PieceRotation', 'cells left right top bottom masks columns')
+
+# A shape: its name, spawn position and rotations (indexed by rotation).
+PieceShape = namedtuple('PieceShape', 'name spawn rotations')
+
+def _compile_rotation(format):
+    """Builds the PieceRotation for one 5x5 template."""
+    # Offset to center the shape (because our shapes are 5x5)
+    cells = tuple((j - 2, i - 4) for i, line in enumerate(format)
+                  for j, column in enumerate(line) if column == '0')
+    left = min(dx for dx, _ in cells)
+    right = max(dx for dx, _ in cells)
+    top = min(dy for _, dy in cells)
+    bottom = max(dy for _, dy in cells)
+    rows = {}
+    lowest = {}
+    for dx, dy in cells:
+        rows[dy] = rows.get(dy, 0) | (1 << (dx - left))
+        lowest[dx] = max(lowest.get(dx, dy), dy)
+    return PieceRotation(cells, left, right, top, bottom, tuple(sorted(rows.items())),
+                         tuple(sorted(lowest.items())))
+
+PIECES = [PieceShape(name, SPAWN_POSITION, tuple(_compile_rotation(format) for format in shape))
+          for name, shape in zip("SZIOJLT", shapes)]
+
+def spawn_position(index, width=COLUMNS):
+    """Returns where shape index spawns on a board width columns wide (centered like on 10)."""
+    x, y = PIECES[index].spawn
+    return x + (width - COLUMNS) // 2, y
+
+# ------------------------- Classes ------------------------- #
+class Piece:
+    def __init__(self, x, y, index):
+        self.x = x
+        self.y = y
+        self.index = index  # shape id into PIECES
+        self.rotations = PIECES[index].rotations
+        self.rotation = 0
+
+
+class Board:
+    """
+    Bitboard playfield. rows[y] has bit x set when cell (x, y) is occupied;
+    colors[y] packs a 3-bit color id per cell (piece index + 1, 0 = empty),
+    cell x at bits 3x..3x+2.
+
+    heights[x] is the height of column x's stack: the number of rows from
+    the floor up to and including its top cell (0 when empty). It is kept
+    up to date on place() and clear_rows(), so drop distances (ghost piece,
+    hard drop, bot placements) need no row-by-row probing.
+    """
+
+    def __init__(self, width=COLUMNS, height=ROWS):
+        self.width = width
+        self.height = height
+        self.full_row = (1 << width) - 1
+        self.rows = [0] * height
+        self.colors = [0] * height
+        self.heights = [0] * width
+        self.above = []  # (x, y, color id) of the last placed piece's cells above the board
+        self.topped_out = False
+
+    def copy(self):
+        """Returns an independent copy of the board."""
+        board = Board.__new__(Board)
+        board.__dict__.update(self.__dict__)
+        board.rows = self.rows[:]
+        board.colors = self.colors[:]
+        board.heights = self.heights[:]
+        return board
+
+    def update_heights(self):
+        """Recomputes heights; needed only after editing rows directly."""
+        self.heights = [0] * self.width
+        for y in range(self.height - 1, -1, -1):
+            row = self.rows[y]
+            while row:
+                bit = row & -row
+                self.heights[bit.bit_length() - 1] = self.height - y
+                row ^= bit
+
+    def cell(self, x, y):
+        """Returns the color id at (x, y), 0 if empty."""
+        return (self.colors[y] >> (3 * x)) & 7
+
+    def row_colors(self, y):
+        """Returns the color ids of row y, left to right."""
+        c = self.colors[y]
+        return tuple((c >> (3 * x)) & 7 for x in range(self.width))
+
+    def collides(self, piece):
+        """Returns True if the piece overlaps a wall, the floor or a locked cell."""
+        rotation = piece.rotations[piece.rotation]
+        x = piece.x + rotation.left
+        if x < 0 or piece.x + rotation.right >= self.width:
+            return True
+        rows = self.rows
+        for dy, mask in rotation.masks:
+            y = piece.y + dy
+            if y >= 0 and (y >= self.height or rows[y] & (mask << x)):
+                return True
+        return False
+
+    def hash(self):
+        """Returns an 8-byte digest of the locked cells and their colors."""
+        return hashlib.blake2b(self.pack(), digest_size=8).digest()
+
+    def pack(self):
+        """Returns the colors as bytes, each row's packed ids little-endian in (3 * width + 7) // 8 bytes."""
+        size = (3 * self.width + 7) // 8
+        return b"".join(c.to_bytes(size, "little") for c in self.colors)
+
+    @classmethod
+    def unpack(cls, data, width=COLUMNS, height=ROWS):
+        """Rebuilds a board from pack()'s bytes; occupancy and heights follow from the colors."""
+        board = cls(width, height)
+        size = (3 * width + 7) // 8
+        for y in range(height):
+            c = board.colors[y] = int.from_bytes(data[y * size:(y + 1) * size], "little")
+            row = 0
+            for x in range(width):
+                if (c >> (3 * x)) & 7:
+                    row |= 1 << x
+            board.rows[y] = row
+        board.update_heights()
+        return board
+
+    def drop_distance(self, piece):
+        """
+        Returns how many rows the piece can fall before it lands. Read off
+        the column heights when the piece is above the stack; a piece
+        tucked under an overhang falls back to probing row by row.
+        """
+        distance = None
+        for dx, dy in piece.rotations[piece.rotation].columns:
+            top = self.height - self.heights[piece.x + dx]  # first filled row (or the floor)
+            y = piece.y + dy
+            if y >= top:
+                return self._probe_drop(piece)
+            if distance is None or top - y - 1 < distance:
+                distance = top - y - 1
+        return distance
+
+    def _probe_drop(self, piece):
+        y = piece.y
+        distance = 0
+        while True:
+            piece.y += 1
+            if self.collides(piece):
+                break
+            distance += 1
+        piece.y = y
+        return distance
+
+    def place(self, piece):
+        """
+        Locks the piece into the board and returns its cells. Cells above
+        the board are kept in above until clear_rows() moves them down (or
+        finds the game lost), so follow it with clear_rows().
+        """
+        positions = convert_shape_format(piece)
+        color = piece.index + 1
+        self.above = []
+        for x, y in positions:
+            if y >= 0:
+                self._set(x, y, color)
+            else:
+                self.above.append((x, y, color))
+        return positions
+
+    def _set(self, x, y, color):
+        self.rows[y] |= 1 << x
+        self.colors[y] |= color << (3 * x)
+        if self.height - y > self.heights[x]:
+            self.heights[x] = self.height - y
+
+    def clear_rows(self, ys=None):
+        """
+        Removes full rows and moves the rows above them down, a whole row at
+        a time. Only the distinct rows in ys are tested (pass the rows of the
+        piece just placed: no other row can have become full); all rows if
+        None. Returns the cleared row indices (bottom first) and their color ids.
+
+        Then the game is lost (topped_out) if a cell is left in the top row
+        or above the board, after the cells of the last placed piece that
+        were above the board have moved down with the rows.
+        """
+        rows, full_row, height = self.rows, self.full_row, self.height
+        if ys is None:
+            ys = range(height)
+        rows_to_clear = [y for y in ys if 0 <= y < height and rows[y] == full_row]
+        if not rows_to_clear:
+            self._check_top_out()
+            return [], []
+        rows_to_clear.sort(reverse=True)
+        row_colors = [self.row_colors(i) for i in rows_to_clear]
+        for i in rows_to_clear:
+            del rows[i]
+            del self.colors[i]
+        rows[0:0] = [0] * len(rows_to_clear)
+        self.colors[0:0] = [0] * len(rows_to_clear)
+
+        # Full rows cover every column, so each stack loses exactly that many
+        # rows; a column whose new top is a hole drops to the next cell down.
+        heights = self.heights
+        for x in range(self.width):
+            h = heights[x] - len(rows_to_clear)
+            bit = 1 << x
+            while h > 0 and not rows[height - h] & bit:
+                h -= 1
+            heights[x] = h
+
+        # Every cleared row is below the cells above the board
+        above = []
+        for x, y, color in self.above:
+            y += len(rows_to_clear)
+            if y >= 0:
+                self._set(x, y, color)
+            else:
+                above.append((x, y, color))
+        self.above = above
+        self._check_top_out()
+        return rows_to_clear, row_colors
+
+    def _check_top_out(self):
+        if self.rows[0] or self.above:
+            self.topped_out = True
+
+
+class StepResult(namedtuple('StepResult', 'locked rows row_colors game_over')):
+    """
+    Outcome of one engine step: the cells locked this step (empty if the
+    piece is still falling), the cleared row indices (bottom first, as they
+    were before clearing), their color ids, and the game-over flag.
+    """
+    __slots__ = ()
+
+    @property
+    def cleared(self):
+        return len(self.rows)
+
+# ------------------------- Rule Functions ------------------------- #
+def convert_shape_format(piece):
+    """Converts the piece's shape into grid positions."""
+    x, y = piece.x, piece.y
+    return [(x + dx, y + dy) for dx, dy in piece.rotations[piece.rotation].cells]
+
+def valid_space(piece, board):
+    """Returns True if the piece is in a valid (empty) space on the board."""
+    return not board.collides(piece)
+
+def _ticks_until(elapsed, limit, dt):
+    """Returns the smallest j >= 1 with elapsed + j * dt > limit."""
+    j = max(int((limit - elapsed) // dt) + 1, 1)
+    # Guard against float rounding in the division
+    while j > 1 and elapsed + (j - 1) * dt > limit:
+        j -= 1
+    while not elapsed + j * dt > limit:
+        j += 1
+    return j
+
+# ------------------------- Engine ------------------------- #
+class TetrisEngine:
+    """
+    A single game of Tetris driven by reset()/step().
+
+    Time is measured in milliseconds of simulated play, so a game runs as
+    fast as step() is called. The engine never touches pygame.
+    """
+
+    def __init__(self, difficulty="Medium", seed=None, width=COLUMNS, height=ROWS):
+        self.difficulty = difficulty
+        self.width = width
+        self.height = height
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        """
+        Starts a new game; the same seed always yields the same pieces.
+        Without a seed one is drawn at random and kept in self.seed.
+        """
+        if seed is None:
+            seed = random.randrange(1 << 64)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.sequence = []  # every piece index drawn from rng, in order
+        self.draws = 0      # how many of them the game has used
+        self.board = Board(self.width, self.height)
+        self._packed = None  # board.pack() until the next lock
+        self.current_piece = self.get_shape()
+        self.next_piece = self.get_shape()
+        self.fall_speed = DIFFICULTY_SPEED[self.difficulty]
+        self.fall_time = 0
+        self.level_time = 0
+        self.elapsed = 0
+        self.score = 0
+        self.lines = 0
+        self.pieces = 0
+        self.game_over = False
+
+    def get_shape(self):
+        """
+        Returns a random new piece from this game's RNG. After restore()
+        went back, the pieces already drawn are dealt again in order.
+        """
+        if self.draws == len(self.sequence):
+            self.sequence.append(self.rng.randrange(len(PIECES)))
+        index = self.sequence[self.draws]
+        self.draws += 1
+        x, y = spawn_position(index, self.width)
+        return Piece(x, y, index)
+
+    def step(self, action=NOOP, dt=None):
+        """
+        Applies action, then advances the game clock by dt milliseconds.
+        HARD_DROP locks the piece where it lands, with no gravity step after.
+
+        Gravity moves the piece down once fall_speed has elapsed; when it
+        cannot move, the piece locks. With dt=None the clock advances by
+        exactly one fall interval, so every call is one gravity step - the
+        usual mode for bots and batch simulation.
+        """
+        if self.game_over:
+            return StepResult((), (), (), True)
+
+        self.apply(action)
+        if action == HARD_DROP:
+            locked = self.lock_piece()
+
+        force = dt is None
+        if force:
+            dt = self.fall_speed * 1000
+        self.elapsed += dt
+        self.fall_time += dt
+        self.level_time += dt
+
+        # Increase difficulty over time
+        if self.level_time > SPEED_UP_INTERVAL:
+            self.level_time = 0
+            if self.fall_speed > MIN_FALL_SPEED:
+                self.fall_speed -= SPEED_UP_STEP
+
+        if action == HARD_DROP:
+            # The next piece starts a fresh fall interval
+            self.fall_time = 0
+            return locked
+
+        # Automatic piece falling
+        if force or self.fall_time > self.fall_speed * 1000:
+            self.fall_time = 0
+            piece = self.current_piece
+            piece.y += 1
+            if not valid_space(piece, self.board) and piece.y > 0:
+                piece.y -= 1
+                return self.lock_piece()
+        return StepResult((), (), (), False)
+
+    def advance(self, ticks, dt):
+        """
+        Runs up to ticks idle steps of dt ms, with the same result as calling
+        step(NOOP, dt) that many times. For an integer dt the ticks in which
+        neither gravity nor a speed-up can fire are skipped in one jump.
+        Stops early if the game ends; returns the number of ticks run.
+        """
+        done = 0
+        while done < ticks and not self.game_over:
+            skip = ticks - done - 1
+            if isinstance(dt, int) and dt > 0:
+                skip = min(skip,
+                           _ticks_until(self.fall_time, self.fall_speed * 1000, dt) - 1,
+                           _ticks_until(self.level_time, SPEED_UP_INTERVAL, dt) - 1)
+            if skip > 0:
+                self.elapsed += skip * dt
+                self.fall_time += skip * dt
+                self.level_time += skip * dt
+                done += skip
+            self.step(NOOP, dt)
+            done += 1
+        return done
+
+    def apply(self, action):
+        """
+        Moves or rotates the current piece; returns True if it changed.
+        HARD_DROP moves it to where it would land (step() also locks it).
+        """
+        piece = self.current_piece
+        if action == LEFT:
+            piece.x -= 1
+            if not valid_space(piece, self.board):
+                piece.x += 1
+                return False
+        elif action == RIGHT:
+            piece.x += 1
+            if not valid_space(piece, self.board):
+                piece.x -= 1
+                return False
+        elif action == DOWN:
+            piece.y += 1
+            if not valid_space(piece, self.board):
+                piece.y -= 1
+                return False
+        elif action == ROTATE:
+            old_rotation = piece.rotation
+            piece.rotation = (piece.rotation + 1) % len(piece.rotations)
+            if not valid_space(piece, self.board):
+                piece.rotation = old_rotation
+                return False
+        elif action == HARD_DROP:
+            distance = self.board.drop_distance(piece)
+            piece.y += distance
+            return distance > 0
+        else:
+            return False
+        return True
+
+    def lock_piece(self):
+        """Locks the current piece, clears full rows and spawns the next piece."""
+        piece = self.current_piece
+        positions = self.board.place(piece)
+        self._packed = None
+        self.pieces += 1
+        self.current_piece = self.next_piece
+        self.next_piece = self.get_shape()
+
+        rows, row_colors = self.board.clear_rows({y for _, y in positions})
+        self.lines += len(rows)
+        self.score += len(rows) * POINTS_PER_ROW
+        self.game_over = self.board.topped_out
+        return StepResult(tuple(positions), tuple(rows), tuple(row_colors), self.game_over)
+
+    # ------------------------- Snapshots ------------------------- #
+    def snapshot(self):
+        """
+        Captures the game in a Snapshot of a few hundred bytes. The board is
+        packed once per lock, so between locks a snapshot only packs the
+        pieces and counters. Edit the board only through the engine, or the
+        packed copy goes stale.
+        """
+        if self._packed is None:
+            self._packed = self.board.pack()
+        current, following = self.current_piece, self.next_piece
+        return Snapshot(self._packed, STATE.pack(
+            current.index, current.rotation, current.x, current.y,
+            following.index, following.rotation, following.x, following.y,
+            self.fall_speed, self.fall_time, self.level_time, self.elapsed,
+            self.score, self.lines, self.pieces, self.draws, self.game_over))
+
+    def restore(self, snapshot):
+        """
+        Puts the game back to a snapshot of this game (same seed), e.g. to
+        undo. A snapshot from an earlier session can be restored into a
+        fresh engine with the same seed, difficulty and size: the pieces
+        it had drawn are drawn again.
+        """
+        (index, rotation, x, y, next_index, next_rotation, next_x, next_y,
+         self.fall_speed, self.fall_time, self.level_time, self.elapsed,
+         self.score, self.lines, self.pieces, draws, game_over) = STATE.unpack(snapshot.state)
+        while len(self.sequence) < draws:
+            self.sequence.append(self.rng.randrange(len(PIECES)))
+        self.draws = draws
+        self.board = Board.unpack(snapshot.board, self.width, self.height)
+        self.board.topped_out = self.game_over = bool(game_over)
+        self._packed = snapshot.board
+        self.current_piece = Piece(x, y, index)
+        self.current_piece.rotation = rotation
+        self.next_piece = Piece(next_x, next_y, next_index)
+        self.next_piece.rotation = next_rotation
+
+
+class Snapshot(namedtuple('Snapshot', 'board state')):
+    """
+    A game's state at one moment, from TetrisEngine.snapshot(): the packed
+    board (Board.pack(), shared by the snapshots taken between two locks)
+    and the pieces, clock and score packed with STATE. The pieces still to
+    come are not stored: the engine keeps the sequence it drew, so a
+    snapshot only counts how far into it the game was.
+    """
+    __slots__ = ()
+
+    def to_bytes(self):
+        return self.state + self.board
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(data[STATE.size:], data[:STATE.size])
+
+# current and next piece (index, rotation, x, y), fall_speed, fall_time,
+# level_time, elapsed, score, lines, pieces, pieces drawn, game_over
+STATE = struct.Struct("<BBhhBBhhddddIIIIB")
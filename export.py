@@ -0,0 +1,232 @@
+"""
+Offline frame export.
+
+Renders a replay to an image sequence without a display (SDL's dummy video
+driver), for turning games into video. Frames come at a fixed timestep
+(--fps) rather than in real time, drawn by the game's own renderer onto a
+plain Surface, so they look like the game did, animations included:
+
+    python export.py game.trp --out frames/                     # frames/frame-000000.png, ...
+    python export.py game.trp --format rgb --out game.rgb       # one raw RGB24 stream
+
+A raw stream is what ffmpeg reads with -f rawvideo -pix_fmt rgb24 (the
+frame size and rate are printed). Frames are encoded on background threads
+fed through a bounded queue, so drawing and encoding overlap and a long
+game does not pile up in memory: when the encoders fall behind, rendering
+waits for them. A frame the renderer did not change (often half of them:
+the piece only falls every few frames) is not encoded again but repeated.
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import queue
+import shutil
+import sys
+import threading
+import time
+
+import pygame
+
+import tetris
+from engine import TetrisEngine, NOOP, ROTATE
+from replay import Replay, ReplayError
+
+FPS = 30
+QUEUE_SIZE = 8    # frames waiting for an encoder (a 1200x800 frame is ~4 MB)
+END_FRAMES = 30   # the final frame is held this long, so the game does not stop dead
+FORMATS = ("png", "rgb")
+
+# ------------------------- Encoding ------------------------- #
+class FrameWriter:
+    """
+    Encodes frames on background threads. put() hands over a frame (a
+    Surface nothing draws on afterwards) and only blocks while the queue is
+    full. PNG frames are separate files, so several threads encode them; a
+    raw stream must be written in order, so it gets one. A frame shown
+    count times is encoded once: its PNG is copied, its pixels rewritten.
+    """
+
+    def __init__(self, path, fmt="png", workers=None, queue_size=QUEUE_SIZE):
+        self.path = path
+        self.format = fmt
+        self.frames = 0
+        self.error = None
+        self._queue = queue.Queue(queue_size)
+        if fmt == "png":
+            os.makedirs(path, exist_ok=True)
+            self._stream = None
+            count = workers or os.cpu_count() or 1
+        else:
+            self._stream = open(path, "wb")
+            count = 1
+        self._workers = [threading.Thread(target=self._encode_loop, name=f"frame-encoder-{i}", daemon=True)
+                         for i in range(count)]
+        for worker in self._workers:
+            worker.start()
+
+    def put(self, surface, count=1):
+        """Queues a frame shown count times; raises what an encoder failed with, if anything."""
+        if self.error:
+            raise self.error
+        self._queue.put((self.frames, count, surface))
+        self.frames += count
+
+    def _encode_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self.error:
+                continue  # drain, so put() does not block on a dead writer
+            index, count, surface = item
+            try:
+                if self._stream:
+                    data = pygame.image.tobytes(surface, "RGB")
+                    for _ in range(count):
+                        self._stream.write(data)
+                else:
+                    first = os.path.join(self.path, f"frame-{index:06d}.png")
+                    pygame.image.save(surface, first)
+                    for i in range(index + 1, index + count):
+                        shutil.copyfile(first, os.path.join(self.path, f"frame-{i:06d}.png"))
+            except (OSError, pygame.error) as e:
+                self.error = e
+
+    def close(self):
+        """Waits for the queued frames to be written; raises what an encoder failed with, if anything."""
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        if self._stream:
+            self._stream.close()
+        if self.error:
+            raise self.error
+
+# ------------------------- Rendering ------------------------- #
+def render_frames(replay, fps=FPS, end_frames=END_FRAMES):
+    """
+    Plays the replay on a fixed timestep and yields (surface, changed) for
+    each 1000/fps ms of game time; changed is False when the frame is the
+    same as the one before. The frames are the same Surface, redrawn each
+    time. Returns the engine at the end (yield from gives it back).
+    """
+    engine = TetrisEngine(replay.difficulty, replay.seed, replay.width, replay.height)
+    surface = pygame.Surface((tetris.s_width, tetris.s_height)).convert()
+    renderer = tetris.Renderer(surface)
+    animator = tetris.Animator()
+    inputs = iter(replay.inputs)
+    pending = next(inputs, None)
+    frame_ms = 1000 / fps
+    tick = 0
+    now = 0.0       # game time of the frame, ms
+    accumulator = 0.0
+
+    def handle(result):
+        if result.locked:
+            animator.cancel(tetris.RotationAnimation)
+        if result.rows:
+            animator.add(tetris.RowClearAnimation(now, result))
+
+    while True:
+        # Inputs go in before the tick they were stamped with, as in the game
+        while accumulator >= replay.tick_ms and tick < replay.ticks and not engine.game_over:
+            accumulator -= replay.tick_ms
+            while pending is not None and pending[0] <= tick and not engine.game_over:
+                piece = engine.current_piece
+                old_rotation = piece.rotation
+                handle(engine.step(pending[1], 0))
+                if pending[1] == ROTATE and engine.current_piece is piece and piece.rotation != old_rotation:
+                    animator.cancel(tetris.RotationAnimation)
+                    animator.add(tetris.RotationAnimation(now, piece, old_rotation))
+                pending = next(inputs, None)
+            handle(engine.step(NOOP, replay.tick_ms))
+            tick += 1
+        if tick >= replay.ticks or engine.game_over:
+            # Inputs after the last tick (the move that ended the game)
+            while pending is not None and not engine.game_over:
+                handle(engine.step(pending[1], 0))
+                pending = next(inputs, None)
+        finished = pending is None and (tick >= replay.ticks or engine.game_over)
+
+        grid = tetris.compose_grid(engine, animator, now)
+        # The high-score line shows the score the game reaches
+        renderer.draw(grid, engine.score, max(engine.score, replay.score), engine.next_piece, animator, now)
+        yield surface, renderer.dirty != []
+        if finished and not animator:
+            break
+        now += frame_ms
+        accumulator += frame_ms
+    for _ in range(end_frames):
+        yield surface, False
+    return engine
+
+def export(replay, path, fmt="png", fps=FPS, workers=None, queue_size=QUEUE_SIZE):
+    """Renders the replay's frames to path; returns (frames, engine)."""
+    writer = FrameWriter(path, fmt, workers, queue_size)
+    frames = render_frames(replay, fps)
+    held = None   # the last frame that changed, not queued until it stops repeating
+    count = 0
+    try:
+        while True:
+            surface, changed = next(frames)
+            if changed or held is None:
+                if held is not None:
+                    writer.put(held, count)
+                # A copy: the renderer draws the next frame over this one
+                held = surface.copy()
+                count = 0
+            count += 1
+    except StopIteration as stop:
+        engine = stop.value
+        writer.put(held, count)
+    finally:
+        writer.close()
+    return writer.frames, engine
+
+# ------------------------- Command Line ------------------------- #
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render a Tetris replay to PNG frames or a raw RGB stream.")
+    parser.add_argument("replay", help="replay file (.trp)")
+    parser.add_argument("--out", required=True, help="directory for PNG frames, or the raw RGB file")
+    parser.add_argument("--format", choices=FORMATS, default="png")
+    parser.add_argument("--fps", type=int, default=FPS, help=f"frames per second of game time (default {FPS})")
+    parser.add_argument("--cell", type=tetris.cell_size,
+                        help="cell size in pixels (default: 30, or smaller so a frame fits 1920x1080)")
+    parser.add_argument("--theme", choices=list(tetris.THEMES), default=tetris.current_theme)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="PNG encoder threads")
+    parser.add_argument("--queue", type=int, default=QUEUE_SIZE, help="frames waiting for an encoder at most")
+    args = parser.parse_args(argv)
+
+    try:
+        replay = Replay.load(args.replay)
+    except (OSError, ReplayError) as e:
+        print(f"{args.replay}: {e}", file=sys.stderr)
+        return 1
+    tetris.current_theme = args.theme
+    tetris.shape_colors = tetris.THEMES[args.theme]
+    tetris.set_layout(replay.width, replay.height,
+                      args.cell or tetris.fit_cell_size(replay.width, replay.height, (1920, 1080)))
+    tetris.init_pygame()
+    pygame.display.set_mode((1, 1))  # tiles are converted to the display's pixel format
+
+    start = time.perf_counter()
+    frames, engine = export(replay, args.out, args.format, args.fps, args.workers, args.queue)
+    elapsed = time.perf_counter() - start
+    length = frames / args.fps
+    print(f"{frames} frames ({length:.1f}s at {args.fps} fps, {tetris.s_width}x{tetris.s_height}) "
+          f"in {elapsed:.1f}s ({length / elapsed:.1f}x real time) -> {args.out}")
+    if args.format == "rgb":
+        print(f"ffmpeg -f rawvideo -pix_fmt rgb24 -s {tetris.s_width}x{tetris.s_height} -r {args.fps} "
+              f"-i {args.out} game.mp4")
+    if engine.score != replay.score or engine.board.hash() != replay.board_hash:
+        print(f"warning: the game ended with score {engine.score}, the replay expects {replay.score}",
+              file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
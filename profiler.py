@@ -0,0 +1,205 @@
+"""
+Frame profiler.
+
+Times the phases of each frame with perf_counter_ns, keeps a rolling window
+of samples per phase for p50/p95/p99, and keeps a bounded per-frame trace
+that can be exported as CSV or JSON and as a Chrome trace (open it in
+chrome://tracing or https://ui.perfetto.dev). It does not depend on pygame.
+
+    profiler = FrameProfiler()
+    profiler.begin_frame()
+    profiler.mark("events")    # ends the previous phase, starts this one
+    ...
+    profiler.mark("draw")
+    ...
+    profiler.end_frame()
+    profiler.export("frames.csv")  # also writes frames.trace.json
+
+LatencyMeter measures input-to-display latency the same way: each input's
+arrival time against the display update that first shows its result.
+"""
+import csv
+import json
+import os
+import time
+from collections import deque
+
+WINDOW = 300          # frames the percentiles are taken over
+MAX_FRAMES = 36000    # frames kept for export (10 minutes at 60 fps)
+FRAME = "frame"       # name of the whole-frame sample
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class FrameProfiler:
+    def __init__(self, window=WINDOW, max_frames=MAX_FRAMES):
+        self.window = window
+        self.samples = {FRAME: deque(maxlen=window)}  # name -> recent durations (ns)
+        self.frames = deque(maxlen=max_frames)        # (start_ns, end_ns, [(name, start_ns, end_ns)])
+        self.count = 0
+        self._start = None
+        self._phases = None
+        self._phase = None
+
+    def __bool__(self):
+        return True
+
+    def begin_frame(self):
+        self._start = self._phase_start = time.perf_counter_ns()
+        self._phases = []
+        self._phase = None
+
+    def mark(self, name):
+        """Ends the running phase (if any) and starts phase name."""
+        now = time.perf_counter_ns()
+        if self._phase is not None:
+            self._phases.append((self._phase, self._phase_start, now))
+        self._phase = name
+        self._phase_start = now
+
+    def end_frame(self):
+        """Ends the running phase and records the frame."""
+        if self._start is None:
+            return
+        now = time.perf_counter_ns()
+        if self._phase is not None:
+            self._phases.append((self._phase, self._phase_start, now))
+        self.samples[FRAME].append(now - self._start)
+        for name, start, end in self._phases:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.window)
+            samples.append(end - start)
+        self.frames.append((self._start, now, self._phases))
+        self.count += 1
+        self._start = None
+
+    def discard_frame(self):
+        """Drops the running frame (e.g. one that blocked on the pause screen)."""
+        self._start = None
+
+    def percentiles(self, name=FRAME):
+        """Returns (p50, p95, p99) in milliseconds over the rolling window."""
+        ordered = sorted(self.samples.get(name, ()))
+        return tuple(percentile(ordered, f) / 1e6 for f in (0.50, 0.95, 0.99))
+
+    def summary(self):
+        """Returns {name: {"p50", "p95", "p99", "max"}} in milliseconds."""
+        result = {}
+        for name, samples in self.samples.items():
+            p50, p95, p99 = self.percentiles(name)
+            result[name] = {"p50": round(p50, 4), "p95": round(p95, 4), "p99": round(p99, 4),
+                            "max": round(max(samples, default=0) / 1e6, 4)}
+        return result
+
+    # ------------------------- Export ------------------------- #
+    def phase_names(self):
+        return [name for name in self.samples if name != FRAME]
+
+    def _rows(self):
+        """Per-frame rows: (index, start_ms, total_ms, {phase: ms})."""
+        if not self.frames:
+            return
+        origin = self.frames[0][0]
+        first = self.count - len(self.frames)
+        for i, (start, end, phases) in enumerate(self.frames):
+            durations = {}
+            for name, phase_start, phase_end in phases:
+                durations[name] = durations.get(name, 0) + (phase_end - phase_start) / 1e6
+            yield first + i, (start - origin) / 1e6, (end - start) / 1e6, durations
+
+    def export(self, path):
+        """
+        Writes the per-frame trace to path (CSV if it ends in .csv, JSON
+        otherwise) and a Chrome trace next to it; returns the trace's path.
+        """
+        names = self.phase_names()
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["frame", "start_ms", "total_ms"] + [name + "_ms" for name in names])
+                for index, start, total, durations in self._rows():
+                    writer.writerow([index, f"{start:.4f}", f"{total:.4f}"] +
+                                    [f"{durations.get(name, 0):.4f}" for name in names])
+        else:
+            with open(path, "w") as f:
+                json.dump({
+                    "phases": names,
+                    "summary": self.summary(),
+                    "frames": [{"frame": index, "start_ms": round(start, 4), "total_ms": round(total, 4),
+                                "phases": {name: round(ms, 4) for name, ms in durations.items()}}
+                               for index, start, total, durations in self._rows()],
+                }, f)
+        trace_path = os.path.splitext(path)[0] + ".trace.json"
+        self.export_chrome_trace(trace_path)
+        return trace_path
+
+    def export_chrome_trace(self, path):
+        """Writes the frames and their phases as Chrome trace complete events."""
+        events = []
+        origin = self.frames[0][0] if self.frames else 0
+        first = self.count - len(self.frames)
+        for i, (start, end, phases) in enumerate(self.frames):
+            events.append({"name": FRAME, "cat": FRAME, "ph": "X", "pid": 1, "tid": 1,
+                           "ts": (start - origin) / 1e3, "dur": (end - start) / 1e3,
+                           "args": {"frame": first + i}})
+            for name, phase_start, phase_end in phases:
+                events.append({"name": name, "cat": "phase", "ph": "X", "pid": 1, "tid": 1,
+                               "ts": (phase_start - origin) / 1e3, "dur": (phase_end - phase_start) / 1e3})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+class LatencyMeter:
+    """
+    Input-to-display latency. stamp() each input when it is applied, with
+    the time it arrived; presented() after the display update that shows
+    it. Times are in milliseconds on any one clock.
+    """
+
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)  # latencies (ms)
+        self.count = 0
+        self._pending = []
+
+    def stamp(self, arrived):
+        self._pending.append(arrived)
+
+    def presented(self, now):
+        for arrived in self._pending:
+            self.samples.append(now - arrived)
+        self.count += len(self._pending)
+        self._pending.clear()
+
+    def discard(self):
+        """Drops inputs not shown yet (e.g. the game ended first)."""
+        self._pending.clear()
+
+    def percentiles(self):
+        """Returns (p50, p95, p99) in milliseconds over the rolling window."""
+        ordered = sorted(self.samples)
+        return tuple(percentile(ordered, f) for f in (0.50, 0.95, 0.99))
+
+
+class NullProfiler:
+    """Stand-in used when profiling is off; every call is a no-op."""
+
+    def __bool__(self):
+        return False
+
+    def begin_frame(self):
+        pass
+
+    def mark(self, name):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def discard_frame(self):
+        pass
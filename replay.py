@@ -0,0 +1,266 @@
+"""
+Deterministic replays.
+
+A replay holds everything needed to reproduce a game exactly: the engine
+seed, the difficulty, the board size, the simulation tick length and every
+input stamped with the tick it was applied before. The final tick count, score and board
+hash are stored too, so a replay can check itself.
+
+Binary layout (little-endian, varints are unsigned LEB128):
+
+    header   4s magic "TRPL", B version, Q seed, H tick_ms, H width, H height,
+             B name length (version 1 files have no width and height: 10x20)
+    name     difficulty name (ASCII)
+    inputs   varint count, then per input: varint tick delta, B action
+    footer   varint ticks, I score, 8s board hash
+
+Command line:
+
+    python replay.py verify corpus/            # replay every .trp at full speed
+    python replay.py info game.trp
+    python replay.py record --seeds 0-999 --out corpus/   # bot-played corpus
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import time
+
+from engine import TetrisEngine, DIFFICULTY_SPEED, COLUMNS, ROWS, NOOP
+from tournament import Steering, load_policy, parse_seeds
+
+MAGIC = b"TRPL"
+VERSION = 2
+EXTENSION = ".trp"
+HEADER = struct.Struct("<4sBQHHHB")
+HEADER_V1 = struct.Struct("<4sBQHB")
+FOOTER = struct.Struct("<I8s")
+
+# ------------------------- Encoding ------------------------- #
+def _write_varint(out, value):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+def _read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+class ReplayError(ValueError):
+    """Raised for files that are not valid replays."""
+
+
+class Replay:
+    def __init__(self, seed, difficulty, tick_ms, inputs=None, ticks=0, score=0, board_hash=bytes(8),
+                 width=COLUMNS, height=ROWS):
+        self.seed = seed
+        self.difficulty = difficulty
+        self.tick_ms = tick_ms
+        self.width = width
+        self.height = height
+        self.inputs = inputs if inputs is not None else []  # (tick, action), in order
+        self.ticks = ticks
+        self.score = score
+        self.board_hash = board_hash
+
+    def to_bytes(self):
+        name = self.difficulty.encode("ascii")
+        out = bytearray(HEADER.pack(MAGIC, VERSION, self.seed, self.tick_ms, self.width, self.height, len(name)))
+        out += name
+        _write_varint(out, len(self.inputs))
+        last = 0
+        for tick, action in self.inputs:
+            _write_varint(out, tick - last)
+            out.append(action)
+            last = tick
+        _write_varint(out, self.ticks)
+        out += FOOTER.pack(self.score, self.board_hash)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        try:
+            magic, version = data[:4], data[4]
+            if magic != MAGIC or version not in (1, VERSION):
+                raise ReplayError("not a version 1 or %d replay" % VERSION)
+            if version == 1:
+                _, _, seed, tick_ms, name_length = HEADER_V1.unpack_from(data)
+                width, height = COLUMNS, ROWS
+                pos = HEADER_V1.size
+            else:
+                _, _, seed, tick_ms, width, height, name_length = HEADER.unpack_from(data)
+                pos = HEADER.size
+            difficulty = data[pos:pos + name_length].decode("ascii")
+            pos += name_length
+            count, pos = _read_varint(data, pos)
+            inputs = []
+            tick = 0
+            for _ in range(count):
+                delta, pos = _read_varint(data, pos)
+                tick += delta
+                inputs.append((tick, data[pos]))
+                pos += 1
+            ticks, pos = _read_varint(data, pos)
+            score, board_hash = FOOTER.unpack_from(data, pos)
+        except (struct.error, IndexError, UnicodeDecodeError) as e:
+            raise ReplayError(f"truncated or corrupt replay: {e}") from e
+        return cls(seed, difficulty, tick_ms, inputs, ticks, score, board_hash, width, height)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+class ReplayRecorder:
+    """
+    Records a live game: call record(action) for every input applied to the
+    engine and advance() after every simulation tick.
+    """
+
+    def __init__(self, engine, tick_ms):
+        self.replay = Replay(engine.seed, engine.difficulty, tick_ms, width=engine.width, height=engine.height)
+        self.ticks = 0
+
+    def record(self, action):
+        self.replay.inputs.append((self.ticks, action))
+
+    def advance(self):
+        self.ticks += 1
+
+    def finish(self, engine):
+        """Stamps the final tick count, score and board hash; returns the Replay."""
+        self.replay.ticks = self.ticks
+        self.replay.score = engine.score
+        self.replay.board_hash = engine.board.hash()
+        return self.replay
+
+# ------------------------- Playback ------------------------- #
+def play(replay):
+    """Replays a game without a display, as fast as possible; returns the engine."""
+    engine = TetrisEngine(replay.difficulty, replay.seed, replay.width, replay.height)
+    tick = 0
+    for input_tick, action in replay.inputs:
+        # Idle ticks up to the input are fast-forwarded by the engine
+        tick += engine.advance(input_tick - tick, replay.tick_ms)
+        if engine.game_over:
+            return engine
+        engine.step(action, 0)
+    engine.advance(replay.ticks - tick, replay.tick_ms)
+    return engine
+
+def verify(replay):
+    """Replays a game and returns (ok, score, board_hash) of the result."""
+    engine = play(replay)
+    board_hash = engine.board.hash()
+    return (engine.score == replay.score and board_hash == replay.board_hash,
+            engine.score, board_hash)
+
+# ------------------------- Recording Bots ------------------------- #
+def record_bot_game(policy, difficulty, seed, tick_ms=10, ticks_per_move=10, max_pieces=500):
+    """
+    Plays one game with a tournament policy on the fixed tick and returns
+    its Replay. The bot makes one move every ticks_per_move ticks.
+    """
+    engine = TetrisEngine(difficulty, seed)
+    recorder = ReplayRecorder(engine, tick_ms)
+    steering = Steering(policy, random.Random(seed))
+    while not engine.game_over and engine.pieces < max_pieces:
+        if recorder.ticks % ticks_per_move == 0:
+            action = steering.next_action(engine)
+            engine.step(action, 0)
+            recorder.record(action)
+        engine.step(NOOP, tick_ms)
+        recorder.advance()
+    return recorder.finish(engine)
+
+def _record(task):
+    policy_name, difficulty, seed, out = task
+    replay = record_bot_game(load_policy(policy_name), difficulty, seed)
+    replay.save(os.path.join(out, f"{difficulty.lower()}-{seed}{EXTENSION}"))
+    return replay.ticks
+
+def _verify(path):
+    try:
+        ok, score, board_hash = verify(Replay.load(path))
+    except (OSError, ReplayError) as e:
+        return path, False, str(e)
+    return path, ok, f"score {score}, board {board_hash.hex()}"
+
+# ------------------------- Command Line ------------------------- #
+def find_replays(paths):
+    """Expands directories into the replay files they contain."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if name.endswith(EXTENSION)))
+        else:
+            files.append(path)
+    return files
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify, inspect or record Tetris replays.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    verify_parser = commands.add_parser("verify", help="replay files and check score and board hash")
+    verify_parser.add_argument("paths", nargs="+", help="replay files or directories")
+    verify_parser.add_argument("--workers", type=int, default=os.cpu_count())
+    info_parser = commands.add_parser("info", help="describe a replay file")
+    info_parser.add_argument("path")
+    record_parser = commands.add_parser("record", help="record bot-played games")
+    record_parser.add_argument("--seeds", default="0-99", help="seed list such as 0-99 or 1,5,9")
+    record_parser.add_argument("--difficulty", nargs="+", choices=list(DIFFICULTY_SPEED),
+                               default=list(DIFFICULTY_SPEED))
+    record_parser.add_argument("--policy", default="greedy")
+    record_parser.add_argument("--out", default="replays")
+    record_parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        replay = Replay.load(args.path)
+        print(f"seed {replay.seed}, {replay.difficulty}, {replay.width}x{replay.height}, {replay.tick_ms} ms ticks, "
+              f"{len(replay.inputs)} inputs over {replay.ticks} ticks "
+              f"({replay.ticks * replay.tick_ms / 1000:.1f}s), score {replay.score}, "
+              f"board {replay.board_hash.hex()}")
+        return 0
+
+    start = time.perf_counter()
+    if args.command == "record":
+        os.makedirs(args.out, exist_ok=True)
+        tasks = [(args.policy, difficulty, seed, args.out)
+                 for difficulty in args.difficulty for seed in parse_seeds(args.seeds)]
+        with multiprocessing.Pool(args.workers) as pool:
+            ticks = sum(pool.imap_unordered(_record, tasks, chunksize=4))
+        print(f"recorded {len(tasks)} games ({ticks} ticks) in {time.perf_counter() - start:.1f}s -> {args.out}")
+        return 0
+
+    files = find_replays(args.paths)
+    with multiprocessing.Pool(args.workers) as pool:
+        results = pool.map(_verify, files, chunksize=max(1, len(files) // (args.workers * 8)))
+    failures = [(path, detail) for path, ok, detail in results if not ok]
+    for path, detail in failures:
+        print(f"FAIL {path}: {detail}")
+    print(f"{len(files) - len(failures)}/{len(files)} replays match "
+          f"({time.perf_counter() - start:.1f}s)")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
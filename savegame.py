@@ -0,0 +1,128 @@
+"""
+Saved games.
+
+A game in progress is saved after every lock, so a kiosk that is switched
+off or a window that is closed mid-game can pick the game up again. A save
+is a snapshot (engine.Snapshot) plus what is needed to rebuild the engine
+it came from, a couple of hundred bytes in all. The snapshot is taken on the
+game thread; a background thread writes it atomically (see storage.py), so
+the game never waits on disk.
+
+Binary layout (little-endian):
+
+    header   4s magic "TSAV", B version, Q seed, H width, H height,
+             B name length
+    name     difficulty name (ASCII)
+    state    engine.Snapshot.to_bytes()
+"""
+import atexit
+import os
+import struct
+import sys
+import threading
+
+from engine import TetrisEngine, Snapshot, STATE
+from storage import BackgroundWriter, write_atomic
+
+SAVE_FILE = "saved_game.bin"
+MAGIC = b"TSAV"
+VERSION = 1
+HEADER = struct.Struct("<4sBQHHB")
+
+
+class SaveError(ValueError):
+    """Raised for files that are not valid saved games."""
+
+
+def encode(engine):
+    """Returns the saved-game bytes for the engine's current state."""
+    name = engine.difficulty.encode("ascii")
+    return (HEADER.pack(MAGIC, VERSION, engine.seed, engine.width, engine.height, len(name))
+            + name + engine.snapshot().to_bytes())
+
+def decode(data):
+    """Rebuilds the saved game's engine, positioned where the game was saved."""
+    try:
+        magic, version, seed, width, height, name_length = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise SaveError("not a version %d saved game" % VERSION)
+        pos = HEADER.size + name_length
+        difficulty = data[HEADER.size:pos].decode("ascii")
+        snapshot = Snapshot.from_bytes(data[pos:])
+        if len(snapshot.state) != STATE.size or len(snapshot.board) != height * ((3 * width + 7) // 8):
+            raise SaveError("truncated saved game")
+        engine = TetrisEngine(difficulty, seed, width, height)
+        engine.restore(snapshot)
+    except (struct.error, UnicodeDecodeError, KeyError, IndexError) as e:
+        raise SaveError(f"corrupt saved game: {e}") from e
+    return engine
+
+
+class AutoSaver:
+    """
+    Keeps the save file up to date from the game thread without blocking
+    it. The latest save is also kept in memory, so saved_game() never
+    reads a file the writer may be replacing.
+    """
+
+    def __init__(self, path=SAVE_FILE):
+        self.path = path
+        self.data = b""        # the latest save, b"" for none
+        self._written = None   # the data last written (or found) on disk
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # keeps the writes in order
+        try:
+            with open(path, "rb") as f:
+                self.data = self._written = f.read()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Ignoring unreadable {path}: {e}", file=sys.stderr)
+        self._writer = BackgroundWriter(self.flush, "the game", name="game-saver")
+        atexit.register(self.close)
+
+    def saved_game(self):
+        """Returns the saved game's engine, or None if there is no usable save."""
+        with self._lock:
+            data = self.data
+        if not data:
+            return None
+        try:
+            return decode(data)
+        except SaveError as e:
+            print(f"Ignoring unreadable {self.path}: {e}", file=sys.stderr)
+            return None
+
+    def update(self, engine):
+        """Saves the game's current state (written in the background)."""
+        data = encode(engine)
+        with self._lock:
+            self.data = data
+        self._writer.changed()
+
+    def discard(self):
+        """Deletes the save (in the background), e.g. once the game is over."""
+        with self._lock:
+            self.data = b""
+        self._writer.changed()
+
+    def flush(self):
+        """Writes the latest save now, in the calling thread."""
+        with self._write_lock:
+            with self._lock:
+                data = self.data
+            if data == self._written:
+                return
+            if not data:
+                try:
+                    os.unlink(self.path)
+                except FileNotFoundError:
+                    pass
+                self._written = data
+                return
+            write_atomic(self.path, data, prefix=".save-")
+            self._written = data
+
+    def close(self):
+        """Stops the writer, writing any change it has not written yet."""
+        self._writer.close()
@@ -0,0 +1,89 @@
+"""
+High-score store.
+
+Scores are loaded once and served from memory. When a record changes, a
+background thread writes the whole store atomically (see storage.py), so
+the game never waits on disk. Besides the overall best, it keeps a
+top-N table per difficulty and theme.
+"""
+import atexit
+import json
+import sys
+import threading
+
+from storage import BackgroundWriter, write_atomic
+
+SCORES_FILE = 'high_scores.json'
+LEGACY_FILE = 'high_score.txt'  # single integer written by older versions
+TOP_N = 10
+
+
+class ScoreStore:
+    def __init__(self, path=SCORES_FILE, top_n=TOP_N, legacy_path=LEGACY_FILE):
+        self.path = path
+        self.top_n = top_n
+        self.best = 0
+        self.tables = {}  # difficulty -> theme -> scores, highest first
+        self._lock = threading.Lock()
+        self._load(legacy_path)
+        self._writer = BackgroundWriter(self.flush, "high scores", name="score-writer")
+        atexit.register(self.close)
+
+    def _load(self, legacy_path):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.best = int(data.get("best", 0))
+            self.tables = {difficulty: {theme: [int(s) for s in scores] for theme, scores in themes.items()}
+                           for difficulty, themes in data.get("tables", {}).items()}
+            return
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            print(f"Ignoring unreadable {self.path}: {e}", file=sys.stderr)
+            return
+        try:
+            with open(legacy_path) as f:
+                self.best = int(f.read())
+        except (OSError, ValueError):
+            pass
+
+    def high_score(self, difficulty=None, theme=None):
+        """Returns the best score overall, or for a difficulty (and theme)."""
+        if difficulty is None:
+            return self.best
+        themes = self.tables.get(difficulty, {})
+        if theme is not None:
+            scores = themes.get(theme, [])
+            return scores[0] if scores else 0
+        return max((scores[0] for scores in themes.values() if scores), default=0)
+
+    def top(self, difficulty, theme):
+        """Returns the top-N table for a difficulty and theme, highest first."""
+        return list(self.tables.get(difficulty, {}).get(theme, []))
+
+    def record(self, score, difficulty, theme):
+        """
+        Adds a finished game's score. Returns True if it made a table (the
+        store is then saved in the background), False otherwise.
+        """
+        with self._lock:
+            scores = self.tables.setdefault(difficulty, {}).setdefault(theme, [])
+            if score <= 0 or (len(scores) >= self.top_n and score <= scores[-1]):
+                return False
+            scores.append(score)
+            scores.sort(reverse=True)
+            del scores[self.top_n:]
+            self.best = max(self.best, score)
+        self._writer.changed()
+        return True
+
+    def flush(self):
+        """Writes the store now, in the calling thread."""
+        with self._lock:
+            data = json.dumps({"best": self.best, "tables": self.tables}, indent=2)
+        write_atomic(self.path, data, prefix=".scores-")
+
+    def close(self):
+        """Stops the writer, saving any change it has not written yet."""
+        self._writer.close()
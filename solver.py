@@ -0,0 +1,205 @@
+"""
+Placement solver.
+
+Finds where to put the falling piece: every reachable (rotation, column)
+landing is scored with a heuristic evaluator, and the most promising ones
+are searched further with the pieces after it (the game shows one next
+piece, so the default looks one piece ahead). Board evaluations are
+memoized in a bounded transposition table, which also carries over between
+decisions: the boards searched one piece ahead are the next decision's
+candidates.
+
+A search stops at its deadline, even partway through scoring one piece's
+placements, and returns the best placement found by then, so a decision
+fits in a frame even on very wide boards:
+
+    solver = Solver()
+    plan = solver.best(engine.board, [engine.current_piece, engine.next_piece])
+    plan.rotation, plan.x    # where to steer the piece
+    plan.piece               # the piece as it would land
+
+It powers the hint overlay and the attract-mode demo in tetris.py and the
+"search" tournament policy; it does not depend on pygame.
+"""
+import time
+from collections import OrderedDict, namedtuple
+
+from engine import Piece, LEFT, RIGHT, ROTATE, HARD_DROP
+
+# Evaluator weights (after Yiyuan Lee's tuned player)
+HEIGHT_WEIGHT = -0.510066
+HOLE_WEIGHT = -0.35663
+BUMPINESS_WEIGHT = -0.184483
+LINE_WEIGHT = 0.760666
+TOP_OUT_PENALTY = 1000
+
+TABLE_SIZE = 1 << 16   # boards kept in the transposition table (~160 bytes each)
+BEAM = 6               # placements searched further at each level
+DEADLINE_MS = 8        # search budget per decision (None: search the whole beam)
+
+Placement = namedtuple("Placement", "score rotation x piece")
+
+# ------------------------- Evaluation ------------------------- #
+def placements(board, piece):
+    """
+    Yields every (rotation, x, landed_piece) the piece can be dropped into
+    from its current position by rotating, sliding and falling straight down.
+    """
+    for rotation in range(len(piece.rotations)):
+        start = Piece(piece.x, piece.y, piece.index)
+        start.rotation = rotation
+        if board.collides(start):
+            continue
+        for direction in (-1, 1):
+            x = piece.x if direction == -1 else piece.x + 1
+            while True:
+                landed = Piece(x, piece.y, piece.index)
+                landed.rotation = rotation
+                if board.collides(landed):
+                    break
+                landed.y += board.drop_distance(landed)
+                yield rotation, x, landed
+                x += direction
+
+def evaluate(board):
+    """Scores a board: lower stacks, fewer holes and a flatter surface are better."""
+    heights = board.heights
+    holes = 0
+    seen = 0
+    for row in board.rows:
+        holes += bin(~row & seen & board.full_row).count("1")
+        seen |= row
+    bumpiness = sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+    return HEIGHT_WEIGHT * sum(heights) + HOLE_WEIGHT * holes + BUMPINESS_WEIGHT * bumpiness
+
+
+class TranspositionTable:
+    """Bounded board -> evaluation cache; the least recently used board is evicted."""
+
+    def __init__(self, size=TABLE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def evaluate(self, board):
+        # Occupancy alone decides the score, so the key is a hash of the rows:
+        # a fixed-size int, where the rows themselves run to kilobytes on a
+        # 100x200 board (a 64-bit hash, so a collision is vanishingly rare)
+        key = hash(tuple(board.rows))
+        value = self.entries.get(key)
+        if value is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return value
+        self.misses += 1
+        value = self.entries[key] = evaluate(board)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        return value
+
+# ------------------------- Search ------------------------- #
+class Solver:
+    def __init__(self, beam=BEAM, deadline_ms=DEADLINE_MS, table_size=TABLE_SIZE):
+        self.beam = beam
+        self.deadline_ms = deadline_ms
+        self.table = TranspositionTable(table_size)
+        self.last_ms = 0.0    # duration of the last decision
+        self.last_depth = 0   # pieces it searched
+
+    def best(self, board, pieces):
+        """
+        Returns the best Placement for pieces[0] looking ahead over the rest
+        of pieces (which start at their spawn positions), or None if the
+        piece cannot move at all.
+        """
+        start = time.perf_counter()
+        self._deadline = start + self.deadline_ms / 1000 if self.deadline_ms else float("inf")
+        self.last_depth = 1
+        self.cut = False  # set when the deadline cut the search short
+        result = self._search(board, pieces, 1)
+        self.last_ms = (time.perf_counter() - start) * 1000
+        return result
+
+    def _search(self, board, pieces, depth):
+        """
+        Best placement of pieces[0]; its score is the line bonus plus the
+        score of the best follow-up, or the evaluation of the board it leaves
+        when there is no follow-up (last piece, or out of time). At the
+        deadline it stops scoring placements and sets cut, and the result
+        is the best of those scored so far.
+        """
+        candidates = []
+        for rotation, x, landed in placements(board, pieces[0]):
+            if candidates and time.perf_counter() > self._deadline:
+                self.cut = True
+                break
+            after = board.copy()
+            positions = after.place(landed)
+            rows, _ = after.clear_rows({y for _, y in positions})
+            if after.topped_out:
+                score = -TOP_OUT_PENALTY
+            else:
+                score = self.table.evaluate(after)
+            candidates.append((score, LINE_WEIGHT * len(rows), rotation, x, landed, after))
+        if not candidates:
+            return None
+        candidates.sort(key=lambda c: c[0] + c[1], reverse=True)
+
+        best = None
+        if len(pieces) > 1:
+            # Only fully searched candidates compete, so depths are never mixed
+            for score, bonus, rotation, x, landed, after in candidates[:self.beam]:
+                if self.cut or time.perf_counter() > self._deadline:
+                    self.cut = True
+                    break
+                if after.topped_out:
+                    continue
+                self.last_depth = max(self.last_depth, depth + 1)
+                follow = self._search(after, pieces[1:], depth + 1)
+                if self.cut:
+                    break  # the follow-up was not fully searched
+                if follow is None:
+                    continue
+                if best is None or bonus + follow.score > best.score:
+                    best = Placement(bonus + follow.score, rotation, x, landed)
+        if best is None:
+            score, bonus, rotation, x, landed, _ = candidates[0]
+            best = Placement(score + bonus, rotation, x, landed)
+        return best
+
+
+class Autopilot:
+    """
+    Plays the game: next_action() returns the action that steers the
+    current piece towards the solver's placement, one move per call,
+    finishing with a hard drop.
+    """
+
+    def __init__(self, solver=None):
+        self.solver = solver or Solver()
+        self.piece = None
+        self.target = None
+        self.state = None
+
+    def next_action(self, engine):
+        piece = engine.current_piece
+        if piece is not self.piece:
+            self.piece = piece
+            self.state = None
+            plan = self.solver.best(engine.board, [piece, engine.next_piece])
+            self.target = (plan.rotation, plan.x) if plan else (piece.rotation, piece.x)
+        state = (piece.rotation, piece.x)
+        if state == self.state:
+            # The last move was blocked; drop here
+            self.target = state
+        self.state = state
+        rotation, x = self.target
+        if piece.rotation != rotation:
+            return ROTATE
+        if piece.x != x:
+            return LEFT if piece.x > x else RIGHT
+        return HARD_DROP
@@ -0,0 +1,308 @@
+"""
+Spectator broadcast server.
+
+Streams a live game to any number of TCP clients as JSON lines, so other
+screens can mirror it. Nothing is sent per frame: a lock sends the cells
+it added and the rows it cleared, and a piece move sends just the piece.
+Keyframes carrying the whole board go out periodically and to every new
+client first, so late joiners catch up at once.
+
+The server runs its own asyncio loop in a background thread; the game only
+encodes each message once and hands it over. Every client has a bounded
+queue, and a client that falls that far behind is dropped rather than
+slowing anyone else down.
+
+Messages (every one has "type" and a sequence number "seq"):
+
+    key     w, h, rows (hex packed color ids per row, see engine.Board),
+            piece, next, score, lines
+    lock    cells ([x, y, color id] added), cleared (row indices, bottom
+            first, removed after adding the cells; cells above the board,
+            y < 0, move down with them), piece, next, score, lines
+    piece   piece
+    end     score
+
+where a piece is [shape index, rotation, x, y].
+
+    python tetris.py --spectate 8765
+    python spectate.py watch localhost:8765
+"""
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+
+from engine import PIECES, Piece, convert_shape_format
+
+DEFAULT_PORT = 8765
+QUEUE_SIZE = 256          # messages a client may fall behind before it is dropped
+KEYFRAME_INTERVAL = 2.0   # seconds between keyframes
+
+
+def piece_state(piece):
+    return [piece.index, piece.rotation, piece.x, piece.y]
+
+def locked_color(board, result):
+    """Color id of the piece a step locked, read back from the board or its cleared rows."""
+    cells = [(x, y) for x, y in result.locked if y >= 0]
+    if not cells:
+        return 0
+    x, y = cells[0]
+    if y in result.rows:
+        return result.row_colors[result.rows.index(y)][x]
+    # Rows cleared below the cell moved it down
+    return board.cell(x, y + sum(1 for row in result.rows if row > y))
+
+
+class SpectatorServer:
+    def __init__(self, host="", port=DEFAULT_PORT, queue_size=QUEUE_SIZE, keyframe_interval=KEYFRAME_INTERVAL):
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.keyframe_interval = keyframe_interval
+        self.clients = {}   # writer -> (queue, task) (loop thread only)
+        self.dropped = 0    # clients dropped for falling behind
+        self._backlog = []  # last keyframe and everything since (loop thread only)
+        self._seq = 0
+        self._last_key = 0
+        self._last_piece = None
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    # ------------------------- Game Thread ------------------------- #
+    def start(self):
+        """Starts serving in a background thread; returns once the port is bound."""
+        ready = threading.Event()
+        errors = []
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._server = self._loop.run_until_complete(
+                    asyncio.start_server(self._serve, self.host or None, self.port))
+            except OSError as e:
+                errors.append(e)
+                ready.set()
+                return
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="spectators", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+
+    def stop(self):
+        """Closes the server and every client connection."""
+        if self._loop is None or not self._loop.is_running():
+            return
+
+        async def shutdown():
+            self._server.close()
+            senders = [sender for _, sender in self.clients.values()]
+            for writer in list(self.clients):
+                self._drop(writer)
+            await asyncio.gather(*senders, return_exceptions=True)
+            self._loop.stop()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop)
+        self._thread.join(timeout=2)
+
+    def new_game(self, engine):
+        """Sends a keyframe for a game that just started."""
+        self._last_piece = None
+        self._keyframe(engine)
+
+    def update(self, engine, result=None):
+        """
+        Reports a frame: result is the StepResult of a step that locked a
+        piece (or None). Sends the lock, or the piece if it moved, or
+        nothing; a keyframe replaces it when one is due.
+        """
+        if time.monotonic() - self._last_key >= self.keyframe_interval:
+            self._keyframe(engine)
+            return
+        if result is not None and result.locked:
+            self._last_piece = piece_state(engine.current_piece)
+            color = locked_color(engine.board, result)
+            self._publish({
+                "type": "lock",
+                "cells": [[x, y, color] for x, y in result.locked],
+                "cleared": list(result.rows),
+                "piece": self._last_piece,
+                "next": piece_state(engine.next_piece),
+                "score": engine.score,
+                "lines": engine.lines,
+            })
+            return
+        state = piece_state(engine.current_piece)
+        if state != self._last_piece:
+            self._last_piece = state
+            self._publish({"type": "piece", "piece": state})
+
+    def game_over(self, engine):
+        self._publish({"type": "end", "score": engine.score})
+
+    def _keyframe(self, engine):
+        board = engine.board
+        self._last_key = time.monotonic()
+        self._last_piece = piece_state(engine.current_piece)
+        self._publish({
+            "type": "key",
+            "w": board.width,
+            "h": board.height,
+            "rows": [format(c, "x") if c else "" for c in board.colors],
+            "piece": self._last_piece,
+            "next": piece_state(engine.next_piece),
+            "score": engine.score,
+            "lines": engine.lines,
+        }, keyframe=True)
+
+    def _publish(self, message, keyframe=False):
+        self._seq += 1
+        message["seq"] = self._seq
+        data = (json.dumps(message, separators=(",", ":")) + "\n").encode()
+        self._loop.call_soon_threadsafe(self._fan_out, data, keyframe)
+
+    # ------------------------- Server Thread ------------------------- #
+    def _fan_out(self, data, keyframe):
+        if keyframe:
+            self._backlog = [data]
+        elif self._backlog and len(self._backlog) <= self.queue_size:
+            self._backlog.append(data)
+        for writer, (queue, _) in list(self.clients.items()):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self._drop(writer)
+
+    def _drop(self, writer):
+        _, sender = self.clients.pop(writer, (None, None))
+        if sender is not None and sender is not asyncio.current_task():
+            sender.cancel()
+        writer.transport.abort()
+
+    async def _serve(self, reader, writer):
+        queue = asyncio.Queue(self.queue_size)
+        # Catch up from the last keyframe. If too much happened since, the
+        # client starts from the next keyframe instead.
+        if len(self._backlog) <= self.queue_size:
+            for data in self._backlog:
+                queue.put_nowait(data)
+        self.clients[writer] = (queue, asyncio.create_task(self._send(queue, writer)))
+        try:
+            # Spectators send nothing; reading just notices when they hang up
+            while await reader.read(4096):
+                pass
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self._drop(writer)
+
+    async def _send(self, queue, writer):
+        try:
+            while True:
+                writer.write(await queue.get())
+                await writer.drain()
+        except (ConnectionError, OSError):
+            self._drop(writer)
+
+
+# ------------------------- Watching ------------------------- #
+class Mirror:
+    """Rebuilds the board and pieces of a game from the message stream."""
+
+    def __init__(self):
+        self.width = self.height = 0
+        self.rows = []
+        self.piece = self.next = None
+        self.score = self.lines = 0
+        self.seq = None
+        self.synced = False
+
+    def apply(self, message):
+        """Applies a message; returns False if it was skipped (no keyframe yet)."""
+        kind = message["type"]
+        if kind == "key":
+            self.width, self.height = message["w"], message["h"]
+            self.rows = [int(r, 16) if r else 0 for r in message["rows"]]
+            self.synced = True
+        elif not self.synced:
+            return False
+        elif kind == "lock":
+            cleared = message["cleared"]
+            for x, y, color in message["cells"]:
+                if y >= 0:
+                    self.rows[y] |= color << (3 * x)
+            for y in cleared:
+                del self.rows[y]
+            self.rows[0:0] = [0] * len(cleared)
+            for x, y, color in message["cells"]:
+                if y < 0 <= y + len(cleared):
+                    self.rows[y + len(cleared)] |= color << (3 * x)
+        self.seq = message["seq"]
+        for key in ("piece", "next", "score", "lines"):
+            if key in message:
+                setattr(self, key, message[key])
+        return True
+
+    def render(self):
+        """Returns the board as text, with the falling piece drawn in."""
+        cells = [[(row >> (3 * x)) & 7 for x in range(self.width)] for row in self.rows]
+        if self.piece:
+            index, rotation, x, y = self.piece
+            piece = Piece(x, y, index)
+            piece.rotation = rotation
+            for px, py in convert_shape_format(piece):
+                if 0 <= py < self.height and 0 <= px < self.width:
+                    cells[py][px] = index + 1
+        lines = ["".join(PIECES[c - 1].name if c else "." for c in row) for row in cells]
+        lines.append(f"score {self.score}  lines {self.lines}  seq {self.seq}")
+        return "\n".join(lines)
+
+
+async def watch(host, port, show=True):
+    reader, writer = await asyncio.open_connection(host, port)
+    mirror = Mirror()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            if mirror.apply(message) and show:
+                print("\033[H\033[J" + mirror.render(), flush=True)
+            if message["type"] == "end":
+                print(f"game over, score {message['score']}")
+    finally:
+        writer.close()
+
+
+def parse_address(text):
+    host, _, port = text.rpartition(":")
+    return host or "localhost", int(port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch a game streamed by tetris.py --spectate.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    watch_parser = commands.add_parser("watch", help="mirror a live game in the terminal")
+    watch_parser.add_argument("address", nargs="?", default=f"localhost:{DEFAULT_PORT}", help="HOST:PORT")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(watch(*parse_address(args.address)))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Could not watch {args.address}: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
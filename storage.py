@@ -0,0 +1,90 @@
+"""
+Background file writing.
+
+write_atomic() replaces a file in one step (temp file + fsync + rename), so
+a crash leaves either the old file or the new one, never a mix of both.
+BackgroundWriter runs a store's flush() on its own thread whenever the
+store reports a change, so the game never waits on disk. High scores
+(scores.py) and saved games (savegame.py) are kept this way.
+"""
+import os
+import sys
+import tempfile
+import stat
+import threading
+
+# Read once, at import: os.umask() can only be read by setting it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def write_atomic(path, data, prefix=".tmp-"):
+    """
+    Replaces path with data (str or bytes) atomically. The file keeps its
+    mode, or gets the one open() would give a new file; mkstemp() alone
+    would leave it readable by its owner only.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp = tempfile.mkstemp(prefix=prefix, suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb" if isinstance(data, bytes) else "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class BackgroundWriter:
+    """
+    Calls flush() on a background thread after changed(). Changes made
+    while a write is running are written by the next one; errors are
+    reported as "Could not save <what>" and writing goes on.
+    """
+
+    def __init__(self, flush, what, name="writer"):
+        self.flush = flush
+        self.what = what
+        self._dirty = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._write_loop, name=name, daemon=True)
+        self._thread.start()
+
+    def changed(self):
+        """Schedules a write."""
+        self._dirty.set()
+
+    def _write(self):
+        try:
+            self.flush()
+        except OSError as e:
+            print(f"Could not save {self.what}: {e}", file=sys.stderr)
+
+    def _write_loop(self):
+        while True:
+            self._dirty.wait()
+            if self._closed:
+                return
+            self._dirty.clear()
+            self._write()
+
+    def close(self):
+        """Stops the thread, writing any change it has not written yet."""
+        if self._closed:
+            return
+        pending = self._dirty.is_set()
+        self._closed = True
+        self._dirty.set()
+        self._thread.join()
+        if pending:
+            self._write()
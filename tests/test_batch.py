@@ -0,0 +1,68 @@
+import random
+
+import numpy as np
+import pytest
+
+from batch import BatchSimulator, SHAPE, ROTATION, X, Y
+from engine import TetrisEngine, NOOP, LEFT, RIGHT, DOWN, ROTATE, HARD_DROP
+from solver import Autopilot, Solver
+from test_engine import make_board, vertical_i
+
+ACTIONS = [NOOP, LEFT, RIGHT, DOWN, ROTATE, HARD_DROP]
+
+
+def board_colors(engine):
+    return np.array([engine.board.row_colors(y) for y in range(engine.height)], dtype=np.uint8)
+
+# Random moves seldom clear a row, so some games are mostly steered by the
+# solver, which clears rows (and tops out with cells left above the board)
+@pytest.mark.parametrize("width, height, games, steered", [(10, 20, 200, 0), (6, 12, 50, 0.8)])
+def test_one_board_plays_like_the_engine(width, height, games, steered):
+    """A one-board batch matches the engine move for move, given the engine's pieces."""
+    rng = random.Random(0)
+    cleared = 0
+    for game in range(games):
+        engine = TetrisEngine("Medium", game, width, height)
+        pilot = Autopilot(Solver(beam=1, deadline_ms=None))
+        sim = BatchSimulator(1, game, width, height)
+        sim._spawn(sim._all, np.array([engine.current_piece.index]))
+        while True:
+            sim.next_shape[0] = engine.next_piece.index
+            action = pilot.next_action(engine) if rng.random() < steered else rng.choice(ACTIONS)
+            result = engine.step(action)
+            step = sim.step([action])
+            assert step.locked[0] == bool(result.locked)
+            assert step.cleared[0] == len(result.rows)
+            assert step.game_over[0] == result.game_over
+            cleared += len(result.rows)
+            if result.game_over:
+                assert step.final_score[0] == engine.score
+                break
+            piece = engine.current_piece
+            assert list(sim.state[0]) == [piece.index, piece.rotation, piece.x, piece.y]
+            assert (sim.boards[0] == board_colors(engine)).all()
+            assert (sim.score[0], sim.lines[0], sim.pieces[0]) == (engine.score, engine.lines, engine.pieces)
+    assert cleared or not steered
+
+# The top-out cases of test_engine.py: (rows, top of the vertical I in column 0)
+@pytest.mark.parametrize("rows, top", [
+    ([0, 0, 0, 0b1111111110] + [1] * 16, 0),   # clears row 3, not lost
+    ([0b1111111110] * 3 + [1] * 17, -1),       # the cell above moves down, not lost
+    ([0] * 4 + [1] * 16, 0),                   # lost: the top row is taken
+    ([0b1111111110] + [1] * 19, -3),           # lost: cells stay above the board
+])
+def test_lock_and_top_out_match_the_engine(rows, top):
+    board = make_board(rows)
+    piece = vertical_i(0, top)
+    sim = BatchSimulator(1, 0)
+    sim.boards[0] = [board.row_colors(y) for y in range(board.height)]
+    sim.state[0, [SHAPE, ROTATION, X, Y]] = piece.index, piece.rotation, piece.x, piece.y
+    step = sim.step([NOOP])  # the I rests on column 0's stack, so gravity locks it
+
+    positions = board.place(piece)
+    cleared, _ = board.clear_rows({y for _, y in positions})
+    assert step.locked[0]
+    assert step.cleared[0] == len(cleared)
+    assert step.game_over[0] == board.topped_out
+    if not board.topped_out:
+        assert (sim.boards[0] == [board.row_colors(y) for y in range(board.height)]).all()
@@ -0,0 +1,51 @@
+from controls import AutoRepeat, MAX_REPEATS
+from engine import LEFT, RIGHT, DOWN, ROTATE
+
+
+def make(das=170, arr=50):
+    return AutoRepeat({LEFT: (das, arr), RIGHT: (das, arr), DOWN: (50, 50)})
+
+
+def test_repeats_after_the_delay_then_every_interval():
+    repeat = make()
+    repeat.press(LEFT, 1000)
+    assert repeat.next_due() == 1170
+    assert repeat.due(1169) == []
+    assert repeat.due(1300) == [(LEFT, 1170), (LEFT, 1220), (LEFT, 1270)]
+    assert repeat.next_due() == 1320
+    repeat.release(LEFT, 1310)
+    assert repeat.next_due() is None and repeat.due(2000) == []
+
+def test_the_count_does_not_depend_on_how_often_due_is_called():
+    for step in (7, 16, 50, 100):
+        repeat = make()
+        repeat.press(DOWN, 0)
+        count = sum(len(repeat.due(now)) for now in list(range(0, 600, step)) + [600])
+        assert count == 12
+
+def test_the_direction_pressed_last_wins():
+    repeat = make()
+    repeat.press(LEFT, 0)
+    repeat.press(RIGHT, 100)
+    assert [action for action, _ in repeat.due(1000)] == [RIGHT] * 15
+
+def test_a_stall_does_not_leave_a_backlog():
+    repeat = make(arr=1)
+    repeat.press(LEFT, 0)
+    assert len(repeat.due(100000)) == MAX_REPEATS
+    assert repeat.next_due() == 100001
+
+def test_no_interval_slides_once_per_press():
+    repeat = make(arr=0)
+    assert repeat.slides(LEFT) and not repeat.slides(DOWN)
+    repeat.press(LEFT, 0)
+    assert repeat.due(200) == [(LEFT, 170)]
+    assert repeat.due(5000) == []
+    assert repeat.next_due() is None  # nothing to wake up for
+    repeat.press(LEFT, 6000)
+    assert repeat.due(6170) == [(LEFT, 6170)]
+
+def test_other_actions_do_not_repeat():
+    repeat = make()
+    repeat.press(ROTATE, 0)
+    assert repeat.next_due() is None
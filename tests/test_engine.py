@@ -0,0 +1,87 @@
+import random
+
+from engine import Board, Piece, TetrisEngine, NOOP, LEFT, RIGHT, DOWN, ROTATE, HARD_DROP
+
+I_PIECE = 2  # index into PIECES
+
+
+def make_board(rows, width=10, height=20):
+    """Builds a board from occupancy masks (color 1 for every cell)."""
+    board = Board(width, height)
+    for y, row in enumerate(rows):
+        board.rows[y] = row
+        board.colors[y] = sum(1 << (3 * x) for x in range(width) if row >> x & 1)
+    board.update_heights()
+    return board
+
+def vertical_i(x, top):
+    """A vertical I piece whose cells fill column x from row top down."""
+    piece = Piece(0, 0, I_PIECE)
+    for rotation, shape in enumerate(piece.rotations):
+        if len({dy for _, dy in shape.cells}) == 4:
+            piece.rotation = rotation
+            break
+    cells = piece.rotations[piece.rotation].cells
+    piece.x = x - cells[0][0]
+    piece.y = top - min(dy for _, dy in cells)
+    return piece
+
+def check_board(board):
+    """Asserts that occupancy, colors and heights agree."""
+    for y in range(board.height):
+        assert board.rows[y] == sum(1 << x for x in range(board.width) if board.cell(x, y))
+    heights = board.heights[:]
+    board.update_heights()
+    assert board.heights == heights
+
+
+def test_clear_below_the_top_is_not_a_loss():
+    # Column 0 empty down to row 3, which is full but for it: the I clears
+    # row 3, so its top cell (row 0) ends up in row 1
+    board = make_board([0, 0, 0, 0b1111111110] + [1] * 16)
+    positions = board.place(vertical_i(0, 0))
+    rows, _ = board.clear_rows({y for _, y in positions})
+    assert rows == [3]
+    assert not board.topped_out
+    assert board.rows[0] == 0 and board.rows[1] == 1
+    check_board(board)
+
+def test_cells_above_the_board_move_down_with_cleared_rows():
+    board = make_board([0b1111111110] * 3 + [1] * 17)
+    positions = board.place(vertical_i(0, -1))
+    rows, _ = board.clear_rows({y for _, y in positions})
+    assert rows == [2, 1, 0]
+    assert not board.topped_out
+    assert board.above == []
+    assert board.rows[2] == 1 and board.heights[0] == 18
+    check_board(board)
+
+def test_lock_in_the_top_row_loses():
+    board = make_board([0] * 4 + [1] * 16)
+    positions = board.place(vertical_i(0, 0))
+    assert board.clear_rows({y for _, y in positions}) == ([], [])
+    assert board.topped_out
+
+def test_cells_left_above_the_board_lose():
+    board = make_board([0b1111111110] + [1] * 19)
+    positions = board.place(vertical_i(0, -3))
+    rows, _ = board.clear_rows({y for _, y in positions})
+    assert rows == [0]
+    assert board.topped_out
+
+def test_heights_and_drop_distances_stay_consistent():
+    rng = random.Random(0)
+    for seed in range(20):
+        engine = TetrisEngine("Hard", seed)
+        while not engine.game_over and engine.pieces < 200:
+            piece = engine.current_piece
+            assert engine.board.drop_distance(piece) == engine.board._probe_drop(piece)
+            engine.step(rng.choice([NOOP, LEFT, RIGHT, DOWN, ROTATE, HARD_DROP]))
+            check_board(engine.board)
+
+def test_wide_board():
+    engine = TetrisEngine("Easy", 7, width=37, height=50)
+    rng = random.Random(1)
+    while not engine.game_over and engine.pieces < 300:
+        engine.step(rng.choice([LEFT, RIGHT, ROTATE, HARD_DROP]))
+        check_board(engine.board)
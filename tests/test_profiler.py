@@ -0,0 +1,99 @@
+import csv
+import json
+
+import pytest
+
+import profiler
+from profiler import FrameProfiler, LatencyMeter, percentile, FRAME
+
+
+class Clock:
+    """A perf_counter_ns that advances only when told to, by whole milliseconds."""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, ms):
+        self.now += int(ms * 1e6)
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(profiler.time, "perf_counter_ns", clock)
+    return clock
+
+def run_frame(frames, clock, events_ms, draw_ms):
+    frames.begin_frame()
+    frames.mark("events")
+    clock.advance(events_ms)
+    frames.mark("draw")
+    clock.advance(draw_ms)
+    frames.end_frame()
+
+
+def test_percentile_is_nearest_rank():
+    ordered = list(range(1, 101))
+    assert [percentile(ordered, f) for f in (0.50, 0.95, 0.99)] == [51, 96, 100]
+    assert percentile([], 0.5) == 0.0
+
+def test_percentiles_cover_the_rolling_window(clock):
+    frames = FrameProfiler(window=10)
+    for ms in range(1, 21):
+        run_frame(frames, clock, 1, ms)
+    # Only the last 10 frames (draw 11..20 ms) count
+    assert frames.percentiles("draw") == (16.0, 20.0, 20.0)
+    assert frames.percentiles() == (17.0, 21.0, 21.0)
+    assert frames.summary()["events"] == {"p50": 1.0, "p95": 1.0, "p99": 1.0, "max": 1.0}
+    assert frames.count == 20
+
+def test_discarded_frames_are_not_recorded(clock):
+    frames = FrameProfiler()
+    run_frame(frames, clock, 1, 2)
+    frames.begin_frame()
+    frames.mark("events")
+    clock.advance(500)  # the pause screen
+    frames.discard_frame()
+    frames.end_frame()
+    assert frames.count == 1
+    assert frames.percentiles() == (3.0, 3.0, 3.0)
+
+def test_export_csv_json_and_chrome_trace(clock, tmp_path):
+    frames = FrameProfiler(max_frames=2)
+    for ms in (1, 2, 3):
+        run_frame(frames, clock, ms, 2 * ms)
+
+    trace_path = frames.export(str(tmp_path / "frames.csv"))
+    with open(tmp_path / "frames.csv", newline="") as f:
+        rows = list(csv.reader(f))
+    # The oldest frame fell out of the trace; the indices keep counting
+    assert rows == [["frame", "start_ms", "total_ms", "events_ms", "draw_ms"],
+                    ["1", "0.0000", "6.0000", "2.0000", "4.0000"],
+                    ["2", "6.0000", "9.0000", "3.0000", "6.0000"]]
+
+    frames.export(str(tmp_path / "frames.json"))
+    data = json.loads((tmp_path / "frames.json").read_text())
+    assert data["phases"] == ["events", "draw"]
+    assert [frame["phases"] for frame in data["frames"]] == [{"events": 2.0, "draw": 4.0},
+                                                            {"events": 3.0, "draw": 6.0}]
+
+    with open(trace_path) as f:
+        trace = json.load(f)["traceEvents"]
+    assert [(e["name"], e["ts"], e["dur"]) for e in trace] == [
+        (FRAME, 0.0, 6000.0), ("events", 0.0, 2000.0), ("draw", 2000.0, 4000.0),
+        (FRAME, 6000.0, 9000.0), ("events", 6000.0, 3000.0), ("draw", 9000.0, 6000.0)]
+
+def test_latency_counts_from_arrival_to_the_display_update():
+    meter = LatencyMeter(window=3)
+    for arrived in (0, 2, 4):
+        meter.stamp(arrived)
+    meter.presented(10)
+    meter.stamp(9)
+    meter.discard()  # the game ended before it was shown
+    meter.stamp(11)
+    meter.presented(12)
+    assert list(meter.samples) == [8, 6, 1]
+    assert meter.count == 4
+    assert meter.percentiles() == (6, 8, 8)
@@ -0,0 +1,34 @@
+import pytest
+
+from replay import Replay, ReplayError, HEADER_V1, MAGIC, play, record_bot_game, verify
+from tournament import load_policy
+
+
+def test_round_trip():
+    replay = Replay(2 ** 64 - 1, "Hard", 10, [(0, 1), (5, 4), (5, 3), (400, 5)], ticks=1000, score=120,
+                    board_hash=bytes(range(8)), width=12, height=30)
+    copy = Replay.from_bytes(replay.to_bytes())
+    assert vars(copy) == vars(replay)
+
+def test_version_1_files_are_10x20():
+    data = HEADER_V1.pack(MAGIC, 1, 42, 10, 4) + b"Easy" + bytes([1, 3, 2, 7]) + Replay(0, "", 0).to_bytes()[-13:]
+    replay = Replay.from_bytes(data)
+    assert (replay.seed, replay.difficulty, replay.width, replay.height) == (42, "Easy", 10, 20)
+    assert replay.inputs == [(3, 2)]
+
+@pytest.mark.parametrize("data", [b"", b"TRPL", b"XXXX" + bytes(40), Replay(1, "Easy", 10).to_bytes()[:-3]])
+def test_corrupt_files_are_rejected(data):
+    with pytest.raises(ReplayError):
+        Replay.from_bytes(data)
+
+def test_recorded_games_verify():
+    for seed in range(3):
+        replay = record_bot_game(load_policy("greedy"), "Medium", seed, max_pieces=40)
+        ok, score, _ = verify(Replay.from_bytes(replay.to_bytes()))
+        assert ok and score == replay.score
+
+def test_a_different_game_is_detected():
+    replay = record_bot_game(load_policy("greedy"), "Hard", 5, max_pieces=40)
+    replay.seed += 1
+    assert not verify(replay)[0]
+    assert play(replay).pieces > 0
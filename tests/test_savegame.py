@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+from engine import TetrisEngine, Snapshot, NOOP, LEFT, RIGHT, DOWN, ROTATE, HARD_DROP
+from savegame import AutoSaver, SaveError, encode, decode
+from scores import ScoreStore
+from solver import Autopilot
+import tetris
+
+ACTIONS = [NOOP, LEFT, RIGHT, DOWN, ROTATE, HARD_DROP]
+
+
+def state(engine):
+    return (engine.board.pack(), engine.score, engine.lines, engine.pieces, engine.game_over,
+            engine.elapsed, engine.fall_speed, engine.current_piece.index, engine.current_piece.x,
+            engine.current_piece.y, engine.current_piece.rotation, engine.next_piece.index)
+
+def play(engine, rng, steps):
+    for _ in range(steps):
+        if engine.game_over:
+            return
+        engine.step(rng.choice(ACTIONS))
+
+
+def test_snapshot_round_trip_continues_the_same_game():
+    rng = random.Random(0)
+    engine = TetrisEngine("Medium", 11)
+    play(engine, rng, 150)
+    snapshot = Snapshot.from_bytes(engine.snapshot().to_bytes())
+    saved = state(engine)
+    moves = [rng.choice(ACTIONS) for _ in range(200)]
+    for action in moves:
+        engine.step(action)
+    after = state(engine)
+
+    # Into the same engine (undo) and into a fresh one (a resumed game)
+    for target in (engine, TetrisEngine("Medium", 11)):
+        target.restore(snapshot)
+        assert state(target) == saved
+        for action in moves:
+            target.step(action)
+        assert state(target) == after
+
+def test_saved_game_round_trip():
+    engine = TetrisEngine("Hard", 2 ** 63 + 5, width=12, height=24)
+    play(engine, random.Random(1), 100)
+    copy = decode(encode(engine))
+    assert (copy.difficulty, copy.seed, copy.width, copy.height) == ("Hard", 2 ** 63 + 5, 12, 24)
+    assert state(copy) == state(engine)
+
+@pytest.mark.parametrize("cut", [0, 5, 20, -1])
+def test_truncated_saves_are_rejected(cut):
+    data = encode(TetrisEngine("Easy", 3))
+    with pytest.raises(SaveError):
+        decode(data[:cut])
+
+def test_auto_saver_writes_and_discards(tmp_path):
+    path = tmp_path / "saved_game.bin"
+    engine = TetrisEngine("Easy", 4)
+    play(engine, random.Random(2), 50)
+    saver = AutoSaver(str(path))
+    assert saver.saved_game() is None
+    saver.update(engine)
+    saver.close()
+    assert path.read_bytes() == encode(engine)
+    assert state(AutoSaver(str(path)).saved_game()) == state(engine)
+
+    saver = AutoSaver(str(path))
+    saver.discard()
+    saver.close()
+    assert not path.exists()
+
+def test_a_resumed_game_is_scored_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(tetris, "_score_store", ScoreStore(str(tmp_path / "high_scores.json")))
+    saver = AutoSaver(str(tmp_path / "saved_game.bin"))
+    engine = TetrisEngine("Medium", 6)
+    pilot = Autopilot()
+    while engine.score == 0:
+        engine.step(pilot.next_action(engine))
+
+    # Quit mid-game: saved, not scored
+    tetris.end_game(engine, "Medium", saver)
+    assert tetris.get_score_store().top("Medium", tetris.current_theme) == []
+
+    # Resume and top out: scored once, save discarded
+    engine = saver.saved_game()
+    play(engine, random.Random(3), 100000)
+    assert engine.game_over
+    tetris.end_game(engine, "Medium", saver)
+    saver.close()
+    assert tetris.get_score_store().top("Medium", tetris.current_theme) == [engine.score]
+    assert saver.saved_game() is None
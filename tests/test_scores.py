@@ -0,0 +1,14 @@
+import json
+
+from scores import ScoreStore
+
+
+def test_score_store_is_written_in_the_background(tmp_path):
+    path = tmp_path / "high_scores.json"
+    store = ScoreStore(str(path), top_n=3, legacy_path=str(tmp_path / "none.txt"))
+    for score in (10, 50, 30, 40):
+        store.record(score, "Easy", "pastel")
+    store.close()
+    assert json.loads(path.read_text())["tables"] == {"Easy": {"pastel": [50, 40, 30]}}
+    assert ScoreStore(str(path)).high_score("Easy") == 50
+    assert not list(tmp_path.glob(".*.tmp"))
@@ -0,0 +1,21 @@
+import time
+
+from engine import TetrisEngine
+from solver import Solver, placements
+
+
+def test_best_is_a_reachable_placement():
+    engine = TetrisEngine("Medium", 4)
+    plan = Solver(deadline_ms=None).best(engine.board, [engine.current_piece, engine.next_piece])
+    reachable = {(rotation, x) for rotation, x, _ in placements(engine.board, engine.current_piece)}
+    assert (plan.rotation, plan.x) in reachable
+    assert not engine.board.collides(plan.piece)
+
+def test_deadline_holds_on_wide_boards():
+    engine = TetrisEngine("Medium", 4, width=100, height=200)
+    solver = Solver(deadline_ms=5)
+    start = time.perf_counter()
+    plan = solver.best(engine.board, [engine.current_piece, engine.next_piece])
+    assert (time.perf_counter() - start) * 1000 < 5 + 20  # one placement past the deadline, at most
+    assert plan is not None and solver.cut
+    assert not engine.board.collides(plan.piece)
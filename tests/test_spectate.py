@@ -0,0 +1,90 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from engine import TetrisEngine
+from solver import Autopilot
+from spectate import SpectatorServer, Mirror, DEFAULT_PORT
+
+
+class Client:
+    """A localhost spectator that mirrors the stream on a thread; ended is set at the game's end."""
+
+    def __init__(self, port):
+        self.sock = socket.create_connection(("127.0.0.1", port))
+        self.mirror = Mirror()
+        self.ended = threading.Event()
+        self.thread = threading.Thread(target=self._read, daemon=True)
+        self.thread.start()
+
+    def _read(self):
+        with self.sock.makefile("rb") as stream:
+            for line in stream:
+                message = json.loads(line)
+                if not self.ended.is_set():
+                    self.mirror.apply(message)
+                if message["type"] == "end":
+                    self.ended.set()
+
+def slow_client(port):
+    """A spectator that never reads, with as little buffering as the kernel allows."""
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024)
+    sock.connect(("127.0.0.1", port))
+    return sock
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_mirrors_follow_the_game_and_slow_clients_are_dropped():
+    server = SpectatorServer("127.0.0.1", 0, queue_size=64, keyframe_interval=0.05)
+    server.start()
+    try:
+        clients = [Client(server.port) for _ in range(5)]
+        slow = slow_client(server.port)
+        wait_for(lambda: len(server.clients) == 6)
+
+        # The solver plays, so rows get cleared
+        engine = TetrisEngine("Hard", 3)
+        pilot = Autopilot()
+        server.new_game(engine)
+        late = None
+        while not engine.game_over and engine.pieces < 150:
+            result = engine.step(pilot.next_action(engine))
+            server.update(engine, result)
+            if late is None and engine.pieces >= 30:
+                late = Client(server.port)  # joins mid-game
+            time.sleep(0.001)
+        server.game_over(engine)
+
+        assert engine.lines > 0
+        for client in clients + [late]:
+            assert client.ended.wait(10)
+            assert client.mirror.synced
+            assert client.mirror.rows == engine.board.colors
+            assert client.mirror.score == engine.score
+
+        # Keyframes until the client that does not read is too far behind
+        while server.dropped == 0:
+            for _ in range(32):  # half a queue, which the readers keep up with
+                server.new_game(engine)
+            time.sleep(0.01)
+        assert server.dropped == 1
+        wait_for(lambda: len(server.clients) == 6)  # the others are still connected
+        slow.close()
+    finally:
+        server.stop()
+
+def test_the_game_imports_spectate_only_when_spectating():
+    code = "import sys, tetris; print(tetris.SPECTATE_PORT, 'spectate' in sys.modules, 'asyncio' in sys.modules)"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True).stdout
+    assert out.split()[-3:] == [str(DEFAULT_PORT), "False", "False"]
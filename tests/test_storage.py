@@ -0,0 +1,28 @@
+import os
+import stat
+
+import pytest
+
+from storage import write_atomic
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="file modes are POSIX")
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+def test_a_new_file_gets_the_mode_open_gives(tmp_path):
+    path = tmp_path / "new.bin"
+    open(tmp_path / "reference", "w").close()
+    write_atomic(str(path), b"data")
+    assert path.read_bytes() == b"data"
+    assert mode(path) == mode(tmp_path / "reference")
+
+def test_a_replaced_file_keeps_its_mode(tmp_path):
+    path = tmp_path / "scores.json"
+    path.write_text("old")
+    os.chmod(path, 0o640)
+    write_atomic(str(path), "new")
+    assert path.read_text() == "new"
+    assert mode(path) == 0o640
+    assert os.listdir(tmp_path) == ["scores.json"]
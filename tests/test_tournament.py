@@ -0,0 +1,36 @@
+import pytest
+
+from tournament import parse_seeds, summarize, play_game, greedy_policy
+
+
+@pytest.mark.parametrize("text, seeds", [
+    ("0-4", [0, 1, 2, 3, 4]),
+    ("1,5,9", [1, 5, 9]),
+    ("0-2,42", [0, 1, 2, 42]),
+    ("7", [7]),
+])
+def test_parse_seeds(text, seeds):
+    assert parse_seeds(text) == seeds
+
+def test_parse_seeds_rejects_garbage():
+    with pytest.raises(ValueError):
+        parse_seeds("0-x")
+
+def game(difficulty, pieces, lines, score, survival_s, topped_out):
+    return {"difficulty": difficulty, "seed": 0, "pieces": pieces, "lines": lines, "score": score,
+            "survival_s": survival_s, "topped_out": topped_out}
+
+def test_summarize_averages_per_difficulty_in_speed_order():
+    games = [game("Hard", 10, 1, 10, 2.0, True),
+             game("Easy", 30, 4, 40, 9.0, False),
+             game("Easy", 20, 2, 20, 6.0, True)]
+    summary = summarize(games)
+    assert list(summary) == ["Easy", "Hard"]
+    assert summary["Easy"] == {"games": 2, "mean_pieces": 25, "mean_lines": 3, "mean_score": 30,
+                               "mean_survival_s": 7.5, "topped_out": 1}
+    assert summary["Hard"]["topped_out"] == 1
+
+def test_games_are_reproducible():
+    first = play_game(greedy_policy, "Medium", 3, max_pieces=50)
+    assert first == play_game(greedy_policy, "Medium", 3, max_pieces=50)
+    assert first["pieces"] == 50 and not first["topped_out"]
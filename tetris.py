@@ -1,21 +1,130 @@
+import time
+_LAUNCH = time.perf_counter()  # taken before the other imports, for the startup report
+
+import argparse
+import atexit
+import json
+import math
+import os
 import pygame
-import random
 import sys
+from collections import OrderedDict, deque
 
-pygame.init()
-pygame.font.init()
+from engine import (TetrisEngine, PIECES, COLUMNS, ROWS, NOOP, LEFT, RIGHT, DOWN, ROTATE,
+                    HARD_DROP, convert_shape_format)
+from controls import AutoRepeat, DAS_MS, ARR_MS, SOFT_DROP_MS
+from profiler import FrameProfiler, NullProfiler, LatencyMeter, FRAME
+from replay import ReplayRecorder, EXTENSION
+from savegame import AutoSaver
+from scores import ScoreStore
+from solver import Solver, Autopilot
 
 # ------------------------- Global Variables ------------------------- #
-s_width = 1200
-s_height = 800
-play_width = 300   # 10 columns * 30 pixels
-play_height = 600  # 20 rows * 30 pixels
+# Board size in cells and cell size in pixels (--cols, --rows, --cell).
+# set_layout() derives the window and play-area geometry below from them.
+board_columns = COLUMNS
+board_rows = ROWS
 block_size = 30
 
-top_left_x = (s_width - play_width) // 2
-top_left_y = s_height - play_height - 50
+MIN_WINDOW = (1200, 800)
+SIDE_PANEL = 450   # room left and right of the play area for the panels
+MIN_GRID_CELL = 8  # smaller cells get no grid lines (they would cover the cells)
+NEXT_BLOCK = 30    # cell size of the next-piece preview, whatever the board's
+
+# The simulation advances in fixed ticks, independent of the frame rate;
+# rendering is capped separately (0 = uncapped).
+SIM_TICK_MS = 10
+MAX_TICKS_PER_FRAME = 25  # drop time beyond this after a stall
+RENDER_FPS = 60
+VSYNC = False  # --vsync: the display refresh paces rendering instead, and RENDER_FPS is 0
+
+# Directory to save a replay of every game to (--record), or None
+REPLAY_DIR = None
+
+# Frame profiling (--profile FILE or TETRIS_PROFILE=FILE): per-phase timings,
+# an on-screen HUD (toggle with F3) and a trace written to FILE after each game
+PROFILE_PATH = None
+PROFILE_HUD_INTERVAL = 500  # ms between HUD refreshes
+profiler = NullProfiler()
+
+# Held moves repeat after DAS ms, then every ARR ms (--das, --arr); see controls.py
+DAS = DAS_MS
+ARR = ARR_MS
+KEY_ACTIONS = {
+    pygame.K_LEFT: LEFT, pygame.K_a: LEFT,
+    pygame.K_RIGHT: RIGHT, pygame.K_d: RIGHT,
+    pygame.K_DOWN: DOWN, pygame.K_s: DOWN,
+    pygame.K_UP: ROTATE, pygame.K_w: ROTATE,
+    pygame.K_SPACE: HARD_DROP,
+}
+# Time from a key press (or auto-repeat) to the display update showing it;
+# on the profiler HUD and printed after each profiled game
+input_latency = LatencyMeter()
+
+# Pieces a practice game can take back
+UNDO_DEPTH = 100
+
+# After this many ms idle in the main menu the game plays itself (solver.py)
+# until a key is pressed; a demo move is made every DEMO_MOVE_MS
+ATTRACT_DELAY = 30000
+DEMO_MOVE_MS = 80
+
+# Broadcast server mirroring games to spectators (--spectate), or None.
+# spectate.py (and asyncio) is imported only then, to keep startup quick;
+# hence its default port is repeated here.
+spectators = None
+SPECTATE_PORT = 8765
+
+# Cold-start timings (--startup-report): "-" prints them, a path appends them as JSON lines
+STARTUP_REPORT = None
+
+# Left panel and next-piece box
+PANEL_X = 50
+CONTROLS = [
+    "Controls:",
+    # Arrow keys spelled out: the bundled font has no arrow glyphs
+    "Move Left: Left or A",
+    "Move Right: Right or D",
+    "Drop: Down or S",
+    "Rotate: Up or W",
+    "Hard Drop: Space",
+    "Hint: H",
+    "Pause: P"
+]
+CONTROLS_Y = 250
+LINE_HEIGHT = 30
+GRID_COLORKEY = (255, 0, 255)
+
+def set_layout(columns, rows, cell):
+    """
+    Sizes the board, the window and the panels for a columns x rows board
+    of cell-pixel cells. Call it before the window is created.
+    """
+    global board_columns, board_rows, block_size, play_width, play_height, s_width, s_height
+    global top_left_x, top_left_y, SCORE_RECT, NEXT_RECT, PROFILE_RECT
+    board_columns, board_rows, block_size = columns, rows, cell
+    play_width = columns * cell
+    play_height = rows * cell
+    s_width = max(MIN_WINDOW[0], play_width + 2 * SIDE_PANEL)
+    s_height = max(MIN_WINDOW[1], play_height + 200)
+    top_left_x = (s_width - play_width) // 2
+    top_left_y = s_height - play_height - 50
+    SCORE_RECT = pygame.Rect(PANEL_X, 150, top_left_x - PANEL_X - 10, 80)
+    NEXT_RECT = pygame.Rect(top_left_x + play_width + 20, top_left_y + play_height // 2 - 140,
+                            s_width - top_left_x - play_width - 20, 5 * NEXT_BLOCK + 10)
+    # The profiler HUD goes below the controls list
+    PROFILE_RECT = pygame.Rect(PANEL_X, CONTROLS_Y + len(CONTROLS) * LINE_HEIGHT + 10,
+                               top_left_x - PANEL_X - 10, 260)
+    _layers.clear()
+
+def fit_cell_size(columns, rows, screen_size, largest=30):
+    """Returns the largest cell size (up to largest) at which the window fits the screen."""
+    width, height = screen_size
+    cell = min(largest, (width - 2 * SIDE_PANEL) // columns, (height - 200) // rows)
+    return max(cell, 1)
 
-# ------------------------- Themes & Difficulty ------------------------- #
+# ------------------------- Themes ------------------------- #
+# Difficulty levels live in engine.py (DIFFICULTY_SPEED).
 # Two themes: "pastel" and "vibrant"
 THEMES = {
     "pastel": [(48, 213, 200), (245, 105, 145), (99, 155, 255),
@@ -29,193 +138,144 @@ THEMES = {
 current_theme = "pastel"  # default theme
 shape_colors = THEMES[current_theme]
 
-# Difficulty levels determine the starting fall speed:
-DIFFICULTY_SPEED = {
-    "Easy": 0.35,
-    "Medium": 0.27,
-    "Hard": 0.18
-}
+# The ghost piece (where the falling piece would land) is drawn in its
+# color scaled by this factor
+GHOST_SHADE = 0.3
+# The hint (the solver's pick, toggled with H) is drawn brighter than the ghost
+HINT_SHADE = 0.6
+# Cleared rows fade out in this many steps (each step's tiles are pre-rendered)
+FADE_STEPS = 16
+
+def shade(color, factor):
+    """Scales a color towards black (the ghost piece, fading rows)."""
+    return tuple(int(v * factor) for v in color)
+
+# ------------------------- Text Rendering ------------------------- #
+# Fonts are loaded once per (path, size, bold); rendered labels are kept in
+# a bounded LRU cache so unchanged text is never rasterized twice. The font
+# is the TTF bundled with pygame, opened by path: a SysFont lookup scans the
+# system font list first, which is slow on some Linux machines.
+FONT_FACE = os.path.join(os.path.dirname(pygame.__file__), pygame.font.get_default_font())
+LABEL_CACHE_SIZE = 256
+_fonts = {}
+
+def get_font(face, size, bold=True):
+    """Returns the font for (face, size, bold), loading the TTF file only once."""
+    key = (face, size, bold)
+    font = _fonts.get(key)
+    if font is None:
+        font = _fonts[key] = pygame.font.Font(face, size)
+        font.set_bold(bold)
+    return font
+
+class LabelCache:
+    """
+    Bounded LRU cache of rendered text surfaces keyed by (text, font, color).
+    hits and misses count lookups since the cache was created.
+    """
+
+    def __init__(self, maxsize=LABEL_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.labels = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text, font_key, color):
+        """Returns the label for text in the font (face, size, bold) and color."""
+        key = (text, font_key, color)
+        label = self.labels.get(key)
+        if label is not None:
+            self.hits += 1
+            self.labels.move_to_end(key)
+            return label
+        self.misses += 1
+        label = self.labels[key] = get_font(*font_key).render(text, True, color)
+        if len(self.labels) > self.maxsize:
+            self.labels.popitem(last=False)
+        return label
 
-# ------------------------- Tetris Shapes ------------------------- #
-S = [['.....',
-      '.....',
-      '..00.',
-      '.00..',
-      '.....'],
-     ['.....',
-      '..0..',
-      '..00.',
-      '...0.',
-      '.....']]
-
-Z = [['.....',
-      '.....',
-      '.00..',
-      '..00.',
-      '.....'],
-     ['.....',
-      '..0..',
-      '.00..',
-      '.0...',
-      '.....']]
-
-I = [['..0..',
-      '..0..',
-      '..0..',
-      '..0..',
-      '.....'],
-     ['.....',
-      '0000.',
-      '.....',
-      '.....',
-      '.....']]
-
-O = [['.....',
-      '.....',
-      '.00..',
-      '.00..',
-      '.....']]
-
-J = [['.....',
-      '.0...',
-      '.000.',
-      '.....',
-      '.....'],
-     ['.....',
-      '..00.',
-      '..0..',
-      '..0..',
-      '.....'],
-     ['.....',
-      '.....',
-      '.000.',
-      '...0.',
-      '.....'],
-     ['.....',
-      '..0..',
-      '..0..',
-      '.00..',
-      '.....']]
-
-L = [['.....',
-      '...0.',
-      '.000.',
-      '.....',
-      '.....'],
-     ['.....',
-      '..0..',
-      '..0..',
-      '..00.',
-      '.....'],
-     ['.....',
-      '.....',
-      '.000.',
-      '.0...',
-      '.....'],
-     ['.....',
-      '.00..',
-      '..0..',
-      '..0..',
-      '.....']]
-
-T = [['.....',
-      '..0..',
-      '.000.',
-      '.....',
-      '.....'],
-     ['.....',
-      '..0..',
-      '..00.',
-      '..0..',
-      '.....'],
-     ['.....',
-      '.....',
-      '.000.',
-      '..0..',
-      '.....'],
-     ['.....',
-      '..0..',
-      '.00..',
-      '..0..',
-      '.....']]
-
-shapes = [S, Z, I, O, J, L, T]
-
-# ------------------------- Classes ------------------------- #
-class Piece:
-    def __init__(self, x, y, shape):
-        self.x = x
-        self.y = y
-        self.shape = shape
-        self.color = shape_colors[shapes.index(shape)]
-        self.rotation = 0
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.labels)}
+
+label_cache = LabelCache()
+
+def render_text(text, size, color, bold=True):
+    """Returns a (cached) rendered label."""
+    return label_cache.render(text, (FONT_FACE, size, bold), color)
 
 # ------------------------- Helper Functions ------------------------- #
-def create_grid(locked_positions={}):
-    """Creates a 20x10 grid with colors for locked positions."""
-    grid = [[(0, 0, 0) for _ in range(10)] for _ in range(20)]
-    
-    for i in range(len(grid)):
-        for j in range(len(grid[i])):
-            if (j, i) in locked_positions:
-                grid[i][j] = locked_positions[(j, i)]
+# Grid rows decoded from a board row's packed colors, reused while the
+# theme and board width stay the same (bounded, for very large boards)
+GRID_ROW_CACHE_SIZE = 4096
+_grid_rows = {}
+_grid_rows_for = (None, 0)
+
+def create_grid(board):
+    """Creates a rows x columns grid with colors for the board's locked cells."""
+    global _grid_rows_for
+    if _grid_rows_for[0] is not shape_colors or _grid_rows_for[1] != board.width \
+            or len(_grid_rows) > GRID_ROW_CACHE_SIZE:
+        _grid_rows.clear()
+        _grid_rows_for = (shape_colors, board.width)
+    grid = []
+    for packed in board.colors:
+        row = _grid_rows.get(packed)
+        if row is None:
+            row = _grid_rows[packed] = [shape_colors[c - 1] if c else (0, 0, 0)
+                                        for c in ((packed >> (3 * j)) & 7 for j in range(board.width))]
+        grid.append(row[:])  # a copy: the frame draws the piece and animations into it
     return grid
 
-def convert_shape_format(piece):
-    """Converts the piece's shape into grid positions."""
-    positions = []
-    format = piece.shape[piece.rotation % len(piece.shape)]
+def compose_grid(engine, animator=None, now=0, hint=None):
+    """
+    Returns the grid to show: locked cells, animations, the hint (a landed
+    Piece, if given), the ghost and the falling piece.
+    """
+    grid = create_grid(engine.board)
+    if animator:
+        animator.apply(grid, now)
+    piece = engine.current_piece
+    color = shape_colors[piece.index]
     
-    for i, line in enumerate(format):
-        row = list(line)
-        for j, column in enumerate(row):
-            if column == '0':
-                # Offset to center the shape (because our shapes are 5x5)
-                positions.append((piece.x + j - 2, piece.y + i - 4))
-    return positions
-
-def valid_space(piece, grid):
-    """Returns True if the piece is in a valid (empty) space on the grid."""
-    accepted_positions = [[(j, i) for j in range(10) if grid[i][j] == (0, 0, 0)] for i in range(20)]
-    accepted_positions = [pos for sub in accepted_positions for pos in sub]
+    if hint is not None:
+        for x, y in convert_shape_format(hint):
+            if y > -1:
+                grid[y][x] = shade(color, HINT_SHADE)
     
-    formatted = convert_shape_format(piece)
+    # Ghost piece, from the board's column heights (no probing)
+    drop = engine.board.drop_distance(piece)
+    if drop:
+        ghost = shade(color, GHOST_SHADE)
+        for x, y in convert_shape_format(piece):
+            if y + drop > -1 and grid[y + drop][x] == (0, 0, 0):
+                grid[y + drop][x] = ghost
     
-    for pos in formatted:
-        if pos not in accepted_positions:
-            if pos[1] > -1:
-                return False
-    return True
-
-def check_lost(positions):
-    """Returns True if any locked positions are above the visible grid."""
-    for pos in positions:
-        x, y = pos
-        if y < 1:
-            return True
-    return False
-
-def get_shape():
-    """Returns a random new piece."""
-    return Piece(5, 0, random.choice(shapes))
+    # Draw current piece onto grid (unless an animation is drawing it)
+    if not (animator and animator.hides(piece)):
+        for x, y in convert_shape_format(piece):
+            if y > -1:
+                grid[y][x] = color
+    return grid
 
 def draw_text(surface, text, size, color, pos):
     """Draws text (plain, without drop shadow) at the given position."""
-    font = pygame.font.SysFont('comicsans', size, bold=True)
-    label = font.render(text, True, color)
-    surface.blit(label, pos)
-
-def draw_grid(surface, grid):
-    """Draws grid lines over the play area."""
-    sx = top_left_x
-    sy = top_left_y
-    for i in range(len(grid)):
+    surface.blit(render_text(text, size, color), pos)
+
+def draw_grid(surface, origin=None):
+    """
+    Draws grid lines over the play area (at origin, default the play area's
+    corner): one line per row and one per column.
+    """
+    sx, sy = origin or (top_left_x, top_left_y)
+    if block_size < MIN_GRID_CELL:
+        return
+    for i in range(board_rows):
         pygame.draw.line(surface, (128, 128, 128), (sx, sy + i * block_size),
                          (sx + play_width, sy + i * block_size))
-        for j in range(len(grid[i])):
-            pygame.draw.line(surface, (128, 128, 128),
-                             (sx + j * block_size, sy),
-                             (sx + j * block_size, sy + play_height))
+    for j in range(board_columns):
+        pygame.draw.line(surface, (128, 128, 128),
+                         (sx + j * block_size, sy),
+                         (sx + j * block_size, sy + play_height))
 
 def draw_background(surface):
     """Draws a vertical gradient background."""
@@ -228,43 +288,263 @@ def draw_background(surface):
         b = int(top_color[2] * (1 - ratio) + bottom_color[2] * ratio)
         pygame.draw.line(surface, (r, g, b), (0, i), (s_width, i))
 
-def draw_window(surface, grid, score=0, high_score=0):
-    """Renders the entire game window (background, grid, scores, and control text)."""
-    draw_background(surface)
-    
+def draw_static_panels(surface):
+    """Draws the parts of the game window that never change: title and controls."""
     # Title at top-center
     title = "TETRIS"
-    title_font = pygame.font.SysFont('comicsans', 60, bold=True)
-    title_label = title_font.render(title, True, (255, 255, 255))
+    title_label = render_text(title, 60, (255, 255, 255))
     surface.blit(title_label, (top_left_x + play_width / 2 - title_label.get_width() / 2, 20))
     
-    # Left panel for Score and Controls
-    panel_x = 50
-    draw_text(surface, f"Score: {score}", 30, (255, 255, 255), (panel_x, 150))
-    draw_text(surface, f"High Score: {high_score}", 30, (255, 255, 255), (panel_x, 190))
-    
     # Draw controls information (arranged normally)
-    controls = [
-        "Controls:",
-        "Move Left: ← or A",
-        "Move Right: → or D",
-        "Drop: ↓ or S",
-        "Rotate: ↑ or W",
-        "Pause: P"
-    ]
-    for i, line in enumerate(controls):
-        draw_text(surface, line, 24, (200, 200, 200), (panel_x, 250 + i * 30))
+    for i, line in enumerate(CONTROLS):
+        draw_text(surface, line, 24, (200, 200, 200), (PANEL_X, CONTROLS_Y + i * LINE_HEIGHT))
+
+def draw_scores(surface, score, high_score):
+    """Draws the score lines of the left panel."""
+    draw_text(surface, f"Score: {score}", 30, (255, 255, 255), (PANEL_X, 150))
+    draw_text(surface, f"High Score: {high_score}", 30, (255, 255, 255), (PANEL_X, 190))
+
+def draw_profile_hud(surface, lines):
+    """Draws the profiler's (name, p50, p95, p99) lines below the controls."""
+    font = get_font(FONT_FACE, 22)  # not the label cache: the numbers change every refresh
+    rows = [("ms", "p50", "p95", "p99")] + [(name, f"{p50:.2f}", f"{p95:.2f}", f"{p99:.2f}")
+                                            for name, p50, p95, p99 in lines]
+    for i, row in enumerate(rows):
+        color = (255, 255, 255) if i else (200, 200, 200)
+        for x, text in zip((0, 110, 180, 250), row):
+            surface.blit(font.render(text, True, color), (PROFILE_RECT.x + x, PROFILE_RECT.y + i * 24))
+
+def profile_hud_lines():
+    """Returns the HUD lines for the frame, each phase profiled so far and input latency."""
+    lines = tuple((name,) + profiler.percentiles(name) for name in [FRAME] + profiler.phase_names())
+    if input_latency.samples:
+        lines += (("input", ) + input_latency.percentiles(),)
+    return lines
+
+# ------------------------- Block Tiles ------------------------- #
+# Blocks are pre-rendered sprites (bevel and outline) looked up by color, so
+# a frame draws its cells with one Surface.blits() call. An atlas holds the
+# tiles of one theme at one cell size: every theme color, its ghost and its
+# fade steps and its hint. It is rebuilt when the theme changes.
+MIN_BEVEL_CELL = 6  # smaller tiles are plain squares
+_atlases = {}
+_atlases_for = None
+
+def render_tile(color, size):
+    """Renders one block: the color with a light top-left and a dark bottom-right bevel, outlined."""
+    tile = pygame.Surface((size, size)).convert()
+    tile.fill(color)
+    if color == (0, 0, 0) or size < MIN_BEVEL_CELL:
+        return tile
+    bevel = max(1, size // 8)
+    inner = size - bevel
+    light = tuple(min(255, v * 3 // 2 + 24) for v in color)
+    pygame.draw.polygon(tile, light, [(0, 0), (size, 0), (inner, bevel), (bevel, bevel), (bevel, inner), (0, size)])
+    pygame.draw.polygon(tile, shade(color, 0.6),
+                        [(size, size), (0, size), (bevel, inner), (inner, inner), (inner, bevel), (size, 0)])
+    pygame.draw.rect(tile, shade(color, 0.35), tile.get_rect(), 1)
+    return tile
+
+class TileAtlas(dict):
+    """Block tiles of one size by color; a color not pre-rendered is rendered on first use."""
+
+    def __init__(self, size, colors):
+        super().__init__()
+        self.size = size
+        self[(0, 0, 0)] = render_tile((0, 0, 0), size)
+        for color in colors:
+            for factor in [GHOST_SHADE, HINT_SHADE] + [step / FADE_STEPS for step in range(1, FADE_STEPS + 1)]:
+                key = shade(color, factor)
+                if key not in self:
+                    self[key] = render_tile(key, size)
+
+    def __missing__(self, color):
+        tile = self[color] = render_tile(color, self.size)
+        return tile
+
+def get_atlas(size):
+    """Returns the current theme's tiles at the given cell size, building them on first use."""
+    global _atlases_for
+    if _atlases_for is not shape_colors:
+        _atlases.clear()
+        _atlases_for = shape_colors
+    atlas = _atlases.get(size)
+    if atlas is None:
+        atlas = _atlases[size] = TileAtlas(size, shape_colors)
+    return atlas
+
+def cell_rect(i, j):
+    return pygame.Rect(top_left_x + j * block_size, top_left_y + i * block_size, block_size, block_size)
+
+# ------------------------- Cached Layers ------------------------- #
+# Everything static is rendered once into a surface and blitted from then on.
+_layers = {}
+
+def _build_background():
+    """Gradient background with the title and controls panel."""
+    layer = pygame.Surface((s_width, s_height)).convert()
+    draw_background(layer)
+    draw_static_panels(layer)
+    return layer
+
+def _build_grid():
+    """Grid lines and play-area border on a color-keyed transparent surface."""
+    layer = pygame.Surface((play_width, play_height)).convert()
+    layer.fill(GRID_COLORKEY)
+    layer.set_colorkey(GRID_COLORKEY)
+    draw_grid(layer, (0, 0))
+    # The border is drawn inside the play area, so it is kept thin on small cells
+    pygame.draw.rect(layer, (255, 255, 255), (0, 0, play_width, play_height), max(1, min(4, block_size // 4)))
+    return layer
+
+LAYER_BUILDERS = {
+    "background": _build_background,
+    "grid": _build_grid,
+}
+
+def get_layer(name):
+    """Returns a cached layer, rendering it on first use."""
+    layer = _layers.get(name)
+    if layer is None:
+        layer = _layers[name] = LAYER_BUILDERS[name]()
+    return layer
+
+set_layout(COLUMNS, ROWS, block_size)
+
+def draw_window(surface, grid, score=0, high_score=0):
+    """Renders the entire game window (background, grid, scores, and control text)."""
+    surface.blit(get_layer("background"), (0, 0))
+    draw_scores(surface, score, high_score)
+    
+    # Draw play area grid: clear it, then blit the occupied cells in one batch
+    surface.fill((0, 0, 0), (top_left_x, top_left_y, play_width, play_height))
+    atlas = get_atlas(block_size)
+    surface.blits([(atlas[color], (top_left_x + j * block_size, top_left_y + i * block_size))
+                   for i, row in enumerate(grid) for j, color in enumerate(row) if color != (0, 0, 0)],
+                  doreturn=False)
+    surface.blit(get_layer("grid"), (top_left_x, top_left_y))
+
+class Renderer:
+    """
+    Incremental game-window renderer. Each frame it redraws only the cells
+    that changed since the last frame, the score panel when a score changed
+    and the next-piece box when the next piece changed, then pushes just
+    those rectangles to the display. Call invalidate() after anything else
+    has drawn over the window.
     
-    # Draw play area grid
-    for i in range(len(grid)):
-        for j in range(len(grid[i])):
-            pygame.draw.rect(surface, grid[i][j],
-                             (top_left_x + j * block_size,
-                              top_left_y + i * block_size,
-                              block_size, block_size), 0)
+    draw() only renders into the surface; present() then pushes the changed
+    rectangles to the display, so the two can be timed separately. With
+    vsync, present() updates the display every frame, changed or not: the
+    update waits for the refresh, and that wait is what paces the loop.
+    """
+
+    def __init__(self, surface, vsync=False):
+        self.surface = surface
+        self.vsync = vsync
+        self.invalidate()
+
+    def invalidate(self):
+        """Forces a full redraw on the next frame."""
+        self.cells = None
+        self.scores = None
+        self.next_key = None
+        self.hud = None
+        self.overlays = []
+        self.dirty = []
+
+    def mark_stale(self, rect):
+        """Makes the cells under rect redraw on the next frame."""
+        area = rect.clip(pygame.Rect(top_left_x, top_left_y, play_width, play_height))
+        if not area:
+            return
+        for i in range((area.top - top_left_y) // block_size, (area.bottom - 1 - top_left_y) // block_size + 1):
+            row = self.cells[i]
+            for j in range((area.left - top_left_x) // block_size, (area.right - 1 - top_left_x) // block_size + 1):
+                row[j] = None
+
+    def draw(self, grid, score, high_score, next_piece, animator=None, now=0, hud=None):
+        """
+        Draws the frame. The animator's overlays are drawn on top, and what
+        they covered is restored on the next frame. hud holds the profiler
+        lines to show, if any.
+        """
+        surface = self.surface
+        if self.cells is None:
+            draw_window(surface, grid, score, high_score)
+            draw_next_shape(next_piece, surface)
+            if hud:
+                draw_profile_hud(surface, hud)
+            self.cells = [row[:] for row in grid]
+            self.scores = (score, high_score)
+            self.next_key = (next_piece.index, next_piece.rotation, shape_colors[next_piece.index])
+            self.hud = hud
+            if animator:
+                self.overlays = animator.draw(surface, now)
+            self.dirty = None  # everything
+            return
+        
+        # Restore what last frame's overlays covered
+        dirty = []
+        for rect in self.overlays:
+            surface.blit(get_layer("background"), rect, rect)
+            self.mark_stale(rect)
+            if rect.colliderect(SCORE_RECT):
+                self.scores = None
+            if rect.colliderect(NEXT_RECT):
+                self.next_key = None
+            if rect.colliderect(PROFILE_RECT):
+                self.hud = None
+            dirty.append(rect)
+        
+        # Changed cells: their tiles, then the grid lines over them, in one batch
+        atlas = get_atlas(block_size)
+        grid_layer = get_layer("grid")
+        tiles = []
+        lines = []
+        for i, row in enumerate(grid):
+            drawn = self.cells[i]
+            if row != drawn:
+                for j, color in enumerate(row):
+                    if color != drawn[j]:
+                        rect = cell_rect(i, j)
+                        tiles.append((atlas[color], rect))
+                        lines.append((grid_layer, rect, rect.move(-top_left_x, -top_left_y)))
+                        dirty.append(rect)
+                        drawn[j] = color
+        if tiles:
+            surface.blits(tiles + lines, doreturn=False)
+        
+        if (score, high_score) != self.scores:
+            surface.blit(get_layer("background"), SCORE_RECT, SCORE_RECT)
+            draw_scores(surface, score, high_score)
+            dirty.append(SCORE_RECT)
+            self.scores = (score, high_score)
+        
+        next_key = (next_piece.index, next_piece.rotation, shape_colors[next_piece.index])
+        if next_key != self.next_key:
+            surface.blit(get_layer("background"), NEXT_RECT, NEXT_RECT)
+            draw_next_shape(next_piece, surface)
+            dirty.append(NEXT_RECT)
+            self.next_key = next_key
+        
+        if hud != self.hud:
+            surface.blit(get_layer("background"), PROFILE_RECT, PROFILE_RECT)
+            if hud:
+                draw_profile_hud(surface, hud)
+            dirty.append(PROFILE_RECT)
+            self.hud = hud
+        
+        self.overlays = animator.draw(surface, now) if animator else []
+        dirty.extend(self.overlays)
+        self.dirty = dirty
     
-    draw_grid(surface, grid)
-    pygame.draw.rect(surface, (255, 255, 255), (top_left_x, top_left_y, play_width, play_height), 4)
+    def present(self):
+        """Updates the parts of the display drawn since the last present()."""
+        if self.dirty is None or (self.vsync and not self.dirty):
+            pygame.display.update()
+        elif self.dirty:
+            pygame.display.update(self.dirty)
+        self.dirty = []
 
 def draw_next_shape(piece, surface):
     """Displays the next piece in a preview box with label 'Next Figure:'."""
@@ -274,275 +554,461 @@ def draw_next_shape(piece, surface):
     # Label for next piece
     draw_text(surface, "Next Figure:", 30, (255, 255, 255), (sx, sy - 40))
     
-    format = piece.shape[piece.rotation % len(piece.shape)]
-    
-    for i, line in enumerate(format):
-        for j, column in enumerate(list(line)):
-            if column == '0':
-                pygame.draw.rect(surface, piece.color,
-                                 (sx + j * block_size - 30, sy + i * block_size - 30,
-                                  block_size, block_size), 0)
+    # Cell offsets are relative to the 5x5 template's (2, 4) anchor
+    tile = get_atlas(NEXT_BLOCK)[shape_colors[piece.index]]
+    surface.blits([(tile, (sx + (dx + 1) * NEXT_BLOCK, sy + (dy + 3) * NEXT_BLOCK))
+                   for dx, dy in piece.rotations[piece.rotation].cells], doreturn=False)
+
+# High scores are loaded once and saved in the background (see scores.py).
+_score_store = None
+
+def get_score_store():
+    """Returns the shared ScoreStore, loading it on first use."""
+    global _score_store
+    if _score_store is None:
+        _score_store = ScoreStore()
+    return _score_store
+
+# Games in progress are saved after every lock, to be resumed from the menu (see savegame.py)
+_saver = None
+
+def get_saver():
+    """Returns the shared AutoSaver, reading the saved game on first use."""
+    global _saver
+    if _saver is None:
+        _saver = AutoSaver()
+    return _saver
 
 def update_high_score(new_score):
-    """Reads and updates the high score stored in a text file."""
-    high_score = new_score
-    try:
-        with open('high_score.txt', 'r') as f:
-            high_score = int(f.read())
-    except:
-        high_score = 0
-    if new_score > high_score:
-        high_score = new_score
-        with open('high_score.txt', 'w') as f:
-            f.write(str(high_score))
-    return high_score
-
-# ------------------------- Animated Functions ------------------------- #
-def create_piece_surface(shape_str, color, block_size):
+    """Returns the high score to show: the stored best, or new_score once it beats it."""
+    return max(new_score, get_score_store().high_score())
+
+# ------------------------- Animations ------------------------- #
+def create_piece_surface(rotation, color, block_size):
     """
-    Creates a surface for a given shape (using its 5x5 string representation)
-    drawn in its minimal bounding box. Returns the Surface and its pivot.
+    Creates a surface for a piece rotation (a PieceRotation from the piece
+    table) drawn in its minimal bounding box. Returns the Surface and its pivot.
     """
-    blocks = []
-    for i, line in enumerate(shape_str):
-        for j, char in enumerate(line):
-            if char == '0':
-                blocks.append((i, j))
-    if not blocks:
-        return None, (0, 0)
-    min_i = min(b[0] for b in blocks)
-    max_i = max(b[0] for b in blocks)
-    min_j = min(b[1] for b in blocks)
-    max_j = max(b[1] for b in blocks)
-    width = (max_j - min_j + 1) * block_size
-    height = (max_i - min_i + 1) * block_size
+    width = (rotation.right - rotation.left + 1) * block_size
+    height = (rotation.bottom - rotation.top + 1) * block_size
     surface = pygame.Surface((width, height), pygame.SRCALPHA)
-    for i, line in enumerate(shape_str):
-        for j, char in enumerate(line):
-            if char == '0':
-                rect = pygame.Rect((j - min_j)*block_size, (i - min_i)*block_size, block_size, block_size)
-                pygame.draw.rect(surface, color, rect)
-                pygame.draw.rect(surface, (0, 0, 0), rect, 2)
+    tile = get_atlas(block_size)[color]
+    surface.blits([(tile, ((dx - rotation.left) * block_size, (dy - rotation.top) * block_size))
+                   for dx, dy in rotation.cells], doreturn=False)
     pivot = (width // 2, height // 2)
     return surface, pivot
 
-def animate_rotation(win, piece, old_rotation, new_rotation, locked, grid, score, high_score):
+# Rotation frames are rendered once per (shape, rotation, theme, cell size) and reused.
+ROTATION_STEPS = 10
+_rotation_frames = {}
+
+def get_rotation_frames(index, rotation, theme):
     """
-    Animates the piece rotating from old_rotation to new_rotation.
-    This animation lasts 200ms.
+    Returns ROTATION_STEPS + 1 surfaces of a piece rotation turning from 0
+    to 90 degrees clockwise, rendering them on first use.
     """
-    duration = 200  # milliseconds
-    start_time = pygame.time.get_ticks()
-    # Create a surface for the piece in its old orientation
-    piece_surface, _ = create_piece_surface(piece.shape[old_rotation], piece.color, block_size)
-    
-    # Compute piece position in pixels
-    positions = []
-    for i, line in enumerate(piece.shape[old_rotation]):
-        for j, char in enumerate(line):
-            if char == '0':
-                positions.append((piece.x + j - 2, piece.y + i - 4))
-    if positions:
-        xs = [p[0] for p in positions]
-        ys = [p[1] for p in positions]
-        min_x, max_x = min(xs), max(xs)
-        min_y, max_y = min(ys), max(ys)
-        center_grid = (min_x + (max_x - min_x + 1) / 2, min_y + (max_y - min_y + 1) / 2)
-    else:
-        center_grid = (piece.x, piece.y)
-    pivot_pixel = (top_left_x + center_grid[0] * block_size,
-                   top_left_y + center_grid[1] * block_size)
-    
-    while True:
-        current_time = pygame.time.get_ticks()
-        elapsed = current_time - start_time
-        progress = min(elapsed / duration, 1)
-        angle = -90 * progress  # clockwise rotation
-        rotated_image = pygame.transform.rotate(piece_surface, angle)
-        rotated_rect = rotated_image.get_rect(center=pivot_pixel)
-        
-        temp_grid = create_grid(locked)
-        draw_window(win, temp_grid, score, high_score)
-        win.blit(rotated_image, rotated_rect.topleft)
-        pygame.display.update()
-        pygame.time.delay(20)
-        if progress >= 1:
-            break
+    key = (index, rotation, theme, block_size)
+    frames = _rotation_frames.get(key)
+    if frames is None:
+        surface, _ = create_piece_surface(PIECES[index].rotations[rotation], THEMES[theme][index], block_size)
+        frames = _rotation_frames[key] = [pygame.transform.rotate(surface, -90 * k / ROTATION_STEPS)
+                                          for k in range(ROTATION_STEPS + 1)]
+    return frames
 
-def animate_row_clear(win, grid, row, score, high_score):
+class Animation:
     """
-    Animates a row clearing by fading it out over 300ms.
+    A time-based animation advanced by the main frame loop. progress runs
+    from 0 to 1 over duration milliseconds. Subclasses override apply() to
+    change the grid before it is drawn and/or draw() to paint over the frame.
     """
-    duration = 300  # milliseconds
-    start_time = pygame.time.get_ticks()
-    original_row = grid[row][:]
-    while True:
-        current_time = pygame.time.get_ticks()
-        elapsed = current_time - start_time
-        progress = elapsed / duration
-        # Fade factor: from 1 to 0
-        fade = max(1 - progress, 0)
-        temp_grid = [r[:] for r in grid]
-        for j in range(len(temp_grid[row])):
-            orig_color = original_row[j]
-            faded_color = (int(orig_color[0]*fade), int(orig_color[1]*fade), int(orig_color[2]*fade))
-            temp_grid[row][j] = faded_color
-        draw_window(win, temp_grid, score, high_score)
-        pygame.display.update()
-        pygame.time.delay(20)
-        if elapsed >= duration:
-            break
+    duration = 0
+
+    def __init__(self, start):
+        self.start = start
+
+    def progress(self, now):
+        return min((now - self.start) / self.duration, 1)
+
+    def apply(self, grid, progress):
+        pass
+
+    def draw(self, surface, progress):
+        """Draws the overlay and returns the Rect it covers, or None."""
+        return None
 
-def clear_rows(grid, locked, win, score, high_score):
+    def hides(self, piece):
+        """True if the animation draws this piece itself."""
+        return False
+
+class RotationAnimation(Animation):
+    """Turns the piece's old orientation 90 degrees clockwise; it follows the piece as it moves."""
+    duration = 200
+
+    def __init__(self, start, piece, old_rotation):
+        super().__init__(start)
+        self.piece = piece
+        self.old_rotation = old_rotation
+        self.frames = get_rotation_frames(piece.index, old_rotation, current_theme)
+
+    def hides(self, piece):
+        return piece is self.piece
+
+    def draw(self, surface, progress):
+        piece = self.piece
+        rotation = piece.rotations[self.old_rotation]
+        center = (top_left_x + (piece.x + rotation.left + (rotation.right - rotation.left + 1) / 2) * block_size,
+                  top_left_y + (piece.y + rotation.top + (rotation.bottom - rotation.top + 1) / 2) * block_size)
+        frame = self.frames[round(progress * ROTATION_STEPS)]
+        rect = frame.get_rect(center=center)
+        surface.blit(frame, rect)
+        return rect
+
+class RowClearAnimation(Animation):
     """
-    Checks for full rows, animates their clearing, and removes them.
-    Returns the number of cleared rows.
+    Fades out the rows one lock cleared, all together. The engine has
+    already removed them, so apply() puts them back (faded) into the grid.
     """
-    cleared = 0
-    rows_to_clear = []
-    for i in range(len(grid)-1, -1, -1):
-        row = grid[i]
-        if (0, 0, 0) not in row:
-            rows_to_clear.append(i)
-    for row in rows_to_clear:
-        animate_row_clear(win, grid, row, score, high_score)
-        cleared += 1
-        for j in range(len(grid[row])):
-            try:
-                del locked[(j, row)]
-            except:
-                continue
-    if cleared > 0:
-        for key in sorted(list(locked), key=lambda x: x[1])[::-1]:
-            x, y = key
-            shift = sum(1 for r in rows_to_clear if y < r)
-            if shift > 0:
-                newKey = (x, y + shift)
-                locked[newKey] = locked.pop(key)
-    return cleared
-
-# ------------------------- Pause Functionality ------------------------- #
-def pause_game(win, score, high_score):
-    """Pauses the game until the player presses P again."""
-    paused = True
-    pause_font = pygame.font.SysFont('comicsans', 60, bold=True)
-    pause_label = pause_font.render("PAUSED", True, (255, 255, 255))
-    instruction = pygame.font.SysFont('comicsans', 30).render("Press P to resume", True, (200,200,200))
-    while paused:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_p:
-                    paused = False
-        # Redraw current game state (frozen)
-        temp_grid = [[(0,0,0) for _ in range(10)] for _ in range(20)]
-        draw_window(win, temp_grid, score, high_score)
-        win.blit(pause_label, (top_left_x + play_width/2 - pause_label.get_width()/2,
-                               top_left_y + play_height/2 - pause_label.get_height()/2))
-        win.blit(instruction, (top_left_x + play_width/2 - instruction.get_width()/2,
-                               top_left_y + play_height/2 + pause_label.get_height()/2))
-        pygame.display.update()
-        pygame.time.delay(50)
+    duration = 300
+
+    def __init__(self, start, result):
+        super().__init__(start)
+        self.rows = sorted(zip(result.rows, result.row_colors))
+
+    def apply(self, grid, progress):
+        # Quantized to the fade steps the tile atlas holds
+        fade = round(max(1 - progress, 0) * FADE_STEPS) / FADE_STEPS
+        del grid[:len(self.rows)]
+        for row, colors in self.rows:
+            grid.insert(row, [shade(shape_colors[c - 1], fade) for c in colors])
+
+class Animator:
+    """Runs animations from the main frame loop without blocking it."""
+
+    def __init__(self):
+        self.active = []
+
+    def __bool__(self):
+        return bool(self.active)
+
+    def add(self, animation):
+        self.active.append(animation)
+
+    def cancel(self, kind):
+        """Stops all running animations of the given class."""
+        self.active = [a for a in self.active if not isinstance(a, kind)]
+
+    def hides(self, piece):
+        return any(a.hides(piece) for a in self.active)
+
+    def apply(self, grid, now):
+        """Lets the animations change the grid, newest first."""
+        for animation in reversed(self.active):
+            animation.apply(grid, animation.progress(now))
+
+    def draw(self, surface, now):
+        """Draws the overlays, drops finished animations and returns the drawn Rects."""
+        rects = []
+        for animation in self.active:
+            rect = animation.draw(surface, animation.progress(now))
+            if rect:
+                rects.append(rect)
+        self.active = [a for a in self.active if now - a.start < a.duration]
+        return rects
+
+# ------------------------- Idle Screens ------------------------- #
+def wait_for_key(win, timeout=0):
+    """
+    Sleeps in pygame.event.wait() until a key is pressed and returns the
+    KEYDOWN event, so static screens use no CPU; returns None after timeout
+    ms without one (0 waits forever). Nothing is redrawn while waiting: the
+    window surface still holds the frame, and it is presented again if the
+    window was covered.
+    """
+    deadline = get_ticks() + timeout
+    while True:
+        if timeout:
+            remaining = deadline - get_ticks()
+            if remaining <= 0:
+                return None
+            event = pygame.event.wait(remaining)
+        else:
+            event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            sys.exit()
+        if event.type == pygame.KEYDOWN:
+            return event
+        if event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+            pygame.display.update()
+
+def pause_game(win):
+    """Pauses the game until the player presses P again, over the last frame drawn."""
+    pause_label = render_text("PAUSED", 60, (255, 255, 255))
+    instruction = render_text("Press P to resume", 30, (200,200,200), bold=False)
+    # The window still shows the frozen board; dim it once and sleep
+    dim = pygame.Surface((play_width, play_height), pygame.SRCALPHA)
+    dim.fill((0, 0, 0, 150))
+    win.blit(dim, (top_left_x, top_left_y))
+    win.blit(pause_label, (top_left_x + play_width/2 - pause_label.get_width()/2,
+                           top_left_y + play_height/2 - pause_label.get_height()/2))
+    win.blit(instruction, (top_left_x + play_width/2 - instruction.get_width()/2,
+                           top_left_y + play_height/2 + pause_label.get_height()/2))
+    pygame.display.update()
+    while wait_for_key(win).key != pygame.K_p:
+        pass
 
 # ------------------------- Main Game Function ------------------------- #
-def main(win, difficulty):
-    locked_positions = {}
-    grid = create_grid(locked_positions)
+def main(win, difficulty, engine=None, practice=False):
+    """
+    Plays a new game, or continues engine (a resumed game). A practice game
+    can be undone piece by piece (Z), and is neither saved nor scored.
+    """
+    startup_mark("game_selected")
+    resumed = engine is not None
+    if engine is None:
+        engine = TetrisEngine(difficulty, width=board_columns, height=board_rows)  # seeded per game, so the game can be replayed
+    recorder = ReplayRecorder(engine, SIM_TICK_MS)
+    saver = None if practice else get_saver()
+    if spectators:
+        spectators.new_game(engine)
+    try:
+        run_game(win, engine, recorder, saver=saver, undo=practice)
+    finally:
+        if spectators:
+            spectators.game_over(engine)
+        end_game(engine, difficulty, saver, practice)
+        # A replay cannot start mid-game or follow an undo
+        if REPLAY_DIR and not resumed and not practice:
+            replay = recorder.finish(engine)
+            os.makedirs(REPLAY_DIR, exist_ok=True)
+            replay.save(os.path.join(REPLAY_DIR, time.strftime("%Y%m%d-%H%M%S") + f"-{engine.seed}{EXTENSION}"))
+        if profiler:
+            trace_path = profiler.export(PROFILE_PATH)
+            print(f"Frame profile: {PROFILE_PATH}, {trace_path}")
+            if input_latency.samples:
+                p50, p95, p99 = input_latency.percentiles()
+                print(f"Input latency: p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms "
+                      f"(last {len(input_latency.samples)} of {input_latency.count} inputs)")
+
+def end_game(engine, difficulty, saver=None, practice=False):
+    """
+    Scores a finished game, or saves one left mid-game (the window was
+    closed) to be resumed. A saved game is scored once it is finished, so
+    its score is recorded only once.
+    """
+    if saver:
+        if not engine.game_over:
+            saver.update(engine)
+            return
+        saver.discard()
+    # Scores on other board sizes get their own tables
+    if (board_columns, board_rows) != (COLUMNS, ROWS):
+        difficulty = f"{difficulty} {board_columns}x{board_rows}"
+    if not practice:
+        get_score_store().record(engine.score, difficulty, current_theme)
+
+def run_game(win, engine, recorder, pilot=None, saver=None, undo=False):
+    """
+    Runs the game loop until the game is lost. Inputs and ticks go to
+    recorder, and saver (an AutoSaver) saves the game after every lock.
+    With undo, Z takes back the last piece. With a pilot (a
+    solver.Autopilot) the game plays itself as a demo until a key is
+    pressed; returns True if a key ended it.
+    """
+    def act(action):
+        result = engine.step(action, 0)
+        recorder.record(action)
+        return result
+    
+    def press(action, arrived):
+        """
+        Applies a player's move (a key press); returns True if the game
+        ended. Like a repeat, a move that cannot change the piece is not timed.
+        """
+        if action == HARD_DROP:
+            input_latency.stamp(arrived)
+            return handle(act(HARD_DROP))
+        piece = engine.current_piece
+        old_rotation, old_x, old_y = piece.rotation, piece.x, piece.y
+        act(action)
+        if (piece.rotation, piece.x, piece.y) != (old_rotation, old_x, old_y):
+            input_latency.stamp(arrived)
+        if action == ROTATE and piece.rotation != old_rotation:
+            animator.cancel(RotationAnimation)
+            animator.add(RotationAnimation(get_ticks(), piece, old_rotation))
+        return False
+    
+    def repeat_move(action, due):
+        """
+        Applies an auto-repeat, all the way to the wall if the key slides.
+        A repeat that cannot move the piece is neither recorded nor timed.
+        """
+        moved = False
+        # apply() is what step(action, 0) does to a move, which a replay repeats
+        while engine.apply(action):
+            recorder.record(action)
+            moved = True
+            if not repeat.slides(action):
+                break
+        if moved:
+            input_latency.stamp(due)
+    
+    def handle(result):
+        """Starts the animations for (and broadcasts) a step that locked a piece or cleared rows."""
+        if result.locked:
+            animator.cancel(RotationAnimation)
+            if spectators:
+                spectators.update(engine, result)
+            if saver and not result.game_over:
+                saver.update(engine)
+            if history is not None:
+                history.append(engine.snapshot())
+        if result.rows:
+            animator.add(RowClearAnimation(get_ticks(), result))
+        return result.game_over
     
-    change_piece = False
     run = True
-    current_piece = get_shape()
-    next_piece = get_shape()
-    clock = pygame.time.Clock()
-    fall_time = 0
-    fall_speed = DIFFICULTY_SPEED[difficulty]
-    level_time = 0
-    score = 0
+    accumulator = 0
+    last_frame = polled = now_ms()
+    repeat = AutoRepeat({LEFT: (DAS, ARR), RIGHT: (DAS, ARR), DOWN: (SOFT_DROP_MS, SOFT_DROP_MS)})
+    renderer = Renderer(win, VSYNC)
+    animator = Animator()
+    show_hud = bool(profiler)
+    hud = None
+    hud_time = 0
+    solver = Solver()
+    show_hint = False
+    hint = None
+    hint_for = None
+    move_time = 0
+    # Snapshots taken as each piece spawned, the current piece's last
+    history = deque([engine.snapshot()], maxlen=UNDO_DEPTH) if undo else None
     
     while run:
-        grid = create_grid(locked_positions)
-        fall_time += clock.get_rawtime()
-        level_time += clock.get_rawtime()
-        clock.tick()
-        
-        # Increase difficulty over time (optional speed up)
-        if level_time / 1000 > 5:
-            level_time = 0
-            if fall_speed > 0.12:
-                fall_speed -= 0.005
+        # Sleeps to the render cap, or until a key arrives or a held key
+        # repeats; the elapsed time feeds the fixed-step simulation
+        deadline = None
+        if RENDER_FPS:
+            deadline = last_frame + 1000 / RENDER_FPS
+            next_repeat = repeat.next_due()
+            if next_repeat is not None:
+                deadline = min(deadline, next_repeat)
+        events = wait_for_frame(deadline, polled)
+        now = polled = now_ms()
+        accumulator += min(now - last_frame, SIM_TICK_MS * MAX_TICKS_PER_FRAME)
+        last_frame = now
+        frozen = False  # set when the pause screen ran, so its time is not simulated
+        game_over = False
+        profiler.begin_frame()
         
-        # Automatic piece falling
-        if fall_time / 1000 > fall_speed:
-            fall_time = 0
-            current_piece.y += 1
-            if not valid_space(current_piece, grid) and current_piece.y > 0:
-                current_piece.y -= 1
-                change_piece = True
-        
-        # Event handling (movement, rotation, pause)
-        for event in pygame.event.get():
+        # Event handling (movement, rotation, hard drop, pause), before the
+        # simulation so a move applies in the tick it arrived in
+        profiler.mark("events")
+        for event, arrived in events:
+            if event.type == pygame.KEYUP and event.key in KEY_ACTIONS:
+                repeat.release(KEY_ACTIONS[event.key], arrived)
             if event.type == pygame.QUIT:
                 run = False
                 pygame.quit()
                 sys.exit()
+            if event.type == pygame.KEYDOWN and pilot:
+                # Any key ends the demo
+                profiler.discard_frame()
+                return True
             if event.type == pygame.KEYDOWN:
-                # Pause the game
+                # Show where the solver would put the piece
+                if event.key == pygame.K_h:
+                    show_hint = not show_hint
+                # Undo (practice): back to when the previous piece spawned
+                if event.key == pygame.K_z and history:
+                    if len(history) > 1:
+                        history.pop()
+                    engine.restore(history[-1])
+                    animator.cancel(Animation)
+                    if spectators:
+                        spectators.new_game(engine)
+                # Pause the game; keys released meanwhile are not seen, so repeats stop
                 if event.key == pygame.K_p:
-                    pause_game(win, score, update_high_score(score))
-                # Move Left (Left arrow or A)
-                if event.key == pygame.K_LEFT or event.key == pygame.K_a:
-                    current_piece.x -= 1
-                    if not valid_space(current_piece, grid):
-                        current_piece.x += 1
-                # Move Right (Right arrow or D)
-                if event.key == pygame.K_RIGHT or event.key == pygame.K_d:
-                    current_piece.x += 1
-                    if not valid_space(current_piece, grid):
-                        current_piece.x -= 1
-                # Move Down (Down arrow or S)
-                if event.key == pygame.K_DOWN or event.key == pygame.K_s:
-                    current_piece.y += 1
-                    if not valid_space(current_piece, grid):
-                        current_piece.y -= 1
-                # Rotate (Up arrow or W)
-                if event.key == pygame.K_UP or event.key == pygame.K_w:
-                    old_rotation = current_piece.rotation
-                    current_piece.rotation = (current_piece.rotation + 1) % len(current_piece.shape)
-                    if not valid_space(current_piece, grid):
-                        current_piece.rotation = old_rotation
-                    else:
-                        animate_rotation(win, current_piece, old_rotation, current_piece.rotation,
-                                         locked_positions, grid, score, update_high_score(score))
+                    pause_game(win)
+                    repeat.clear()
+                    frozen = True
+                # Toggle the profiler HUD
+                if event.key == pygame.K_F3 and profiler:
+                    show_hud = not show_hud
+                # Moves: Left/A, Right/D, Down/S, rotate Up/W, hard drop Space
+                action = KEY_ACTIONS.get(event.key)
+                if action is not None:
+                    repeat.press(action, arrived)
+                    game_over = press(action, arrived) or game_over
+        # Held moves repeat on time, not per frame
+        for action, due in repeat.due(now_ms()):
+            repeat_move(action, due)
+        if pilot and get_ticks() - move_time >= DEMO_MOVE_MS:
+            move_time = get_ticks()
+            game_over = handle(act(pilot.next_action(engine))) or game_over
         
-        shape_pos = convert_shape_format(current_piece)
+        # Gravity, locking and speed-up advance in fixed ticks
+        profiler.mark("simulate")
+        while accumulator >= SIM_TICK_MS and not game_over:
+            accumulator -= SIM_TICK_MS
+            result = engine.step(NOOP, SIM_TICK_MS)
+            recorder.advance()
+            game_over = handle(result)
+        if spectators:
+            spectators.update(engine)  # the piece's moves, if any
+        if frozen:
+            last_frame = polled = now_ms()
+            accumulator = 0
+            renderer.invalidate()
+            profiler.discard_frame()  # it blocked on the pause screen
         
-        # Draw current piece onto grid
-        for pos in shape_pos:
-            x, y = pos
-            if y > -1:
-                grid[y][x] = current_piece.color
+        if show_hint and hint_for is not engine.current_piece:
+            # Solved once per piece, within the solver's deadline
+            profiler.mark("hint")
+            hint_for = engine.current_piece
+            plan = solver.best(engine.board, [engine.current_piece, engine.next_piece])
+            hint = plan.piece if plan else None
         
-        # If piece has landed, lock it in place and load next piece
-        if change_piece:
-            for pos in shape_pos:
-                locked_positions[(pos[0], pos[1])] = current_piece.color
-            current_piece = next_piece
-            next_piece = get_shape()
-            change_piece = False
-            cleared = clear_rows(grid, locked_positions, win, score, update_high_score(score))
-            score += cleared * 10
+        profiler.mark("grid")
+        now = get_ticks()
+        grid = compose_grid(engine, animator, now, hint if show_hint else None)
         
-        draw_window(win, grid, score, update_high_score(score))
-        draw_next_shape(next_piece, win)
-        pygame.display.update()
+        profiler.mark("scores")
+        high_score = update_high_score(engine.score)
         
-        if check_lost(locked_positions):
+        if show_hud and now - hud_time >= PROFILE_HUD_INTERVAL:
+            hud = profile_hud_lines()
+            hud_time = now
+        profiler.mark("draw")
+        renderer.draw(grid, engine.score, high_score, engine.next_piece, animator, now,
+                      hud if show_hud else None)
+        if pilot and renderer.dirty is None:
+            # Under the board, which the renderer only repaints on a full redraw
+            label = render_text("DEMO - press any key", 30, (255, 255, 255))
+            win.blit(label, (top_left_x + play_width / 2 - label.get_width() / 2, top_left_y + play_height + 10))
+        profiler.mark("display")
+        renderer.present()
+        input_latency.presented(now_ms())
+        profiler.end_frame()
+        if not pilot and "first_game_frame" not in _startup:
+            startup_mark("first_game_frame")
+            write_startup_report()
+        
+        if game_over:
             draw_text(win, "YOU LOST!", 80, (255, 255, 255), (top_left_x + play_width/2 - 150, top_left_y + play_height/2 - 40))
             pygame.display.update()
             pygame.time.delay(1500)
             run = False
+    input_latency.discard()
+    return False
+
+def attract_mode(win):
+    """Plays demo games with the solver until a key is pressed."""
+    pilot = Autopilot()
+    while True:
+        engine = TetrisEngine("Medium", width=board_columns, height=board_rows)
+        if run_game(win, engine, ReplayRecorder(engine, SIM_TICK_MS), pilot):
+            return
 
 # ------------------------- Menu Functions ------------------------- #
 def customization_menu(win):
@@ -550,6 +1016,7 @@ def customization_menu(win):
     global current_theme, shape_colors
     run = True
     while run:
+        # Drawn once per theme change; in between the menu sleeps
         win.fill((0, 0, 0))
         draw_text(win, "Customization", 60, (255, 255, 255), (s_width/2 - 180, 100))
         draw_text(win, f"Current Theme: {current_theme.capitalize()}", 40, (255, 255, 255), (s_width/2 - 180, 200))
@@ -557,52 +1024,214 @@ def customization_menu(win):
         draw_text(win, "Press any other key to return", 30, (200, 200, 200), (s_width/2 - 180, 350))
         pygame.display.update()
         
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_t:
-                    # Toggle theme
-                    current_theme = "vibrant" if current_theme == "pastel" else "pastel"
-                    shape_colors = THEMES[current_theme]
-                else:
-                    run = False
+        if wait_for_key(win).key == pygame.K_t:
+            # Toggle theme
+            current_theme = "vibrant" if current_theme == "pastel" else "pastel"
+            shape_colors = THEMES[current_theme]
+        else:
+            run = False
+
+def draw_main_menu(win, saved=None):
+    """Draws the main menu; saved is the engine of a game that can be resumed, if any."""
+    win.fill((0, 0, 0))
+    draw_text(win, "TETRIS", 80, (255, 255, 255), (s_width/2 - 150, 50))
+    draw_text(win, "Select Difficulty:", 50, (255, 255, 255), (s_width/2 - 180, 180))
+    draw_text(win, "1 - Easy", 40, (200, 200, 200), (s_width/2 - 150, 250))
+    draw_text(win, "2 - Medium", 40, (200, 200, 200), (s_width/2 - 150, 295))
+    draw_text(win, "3 - Hard", 40, (200, 200, 200), (s_width/2 - 150, 340))
+    draw_text(win, "4 - Practice (Z undoes a piece)", 40, (200, 200, 200), (s_width/2 - 150, 385))
+    if saved:
+        draw_text(win, f"R - Resume {saved.difficulty} game (score {saved.score})", 40, (200, 200, 200),
+                  (s_width/2 - 150, 430))
+    draw_text(win, "Press C for Customization", 40, (200, 200, 200), (s_width/2 - 180, 490))
+    draw_text(win, "Press Q to Quit", 40, (200, 200, 200), (s_width/2 - 150, 540))
+    pygame.display.update()
 
 def main_menu(win):
     """Displays the main menu and waits for user input."""
-    run = True
-    while run:
-        win.fill((0, 0, 0))
-        draw_text(win, "TETRIS", 80, (255, 255, 255), (s_width/2 - 150, 50))
-        draw_text(win, "Select Difficulty:", 50, (255, 255, 255), (s_width/2 - 180, 180))
-        draw_text(win, "1 - Easy", 40, (200, 200, 200), (s_width/2 - 150, 250))
-        draw_text(win, "2 - Medium", 40, (200, 200, 200), (s_width/2 - 150, 300))
-        draw_text(win, "3 - Hard", 40, (200, 200, 200), (s_width/2 - 150, 350))
-        draw_text(win, "Press C for Customization", 40, (200, 200, 200), (s_width/2 - 180, 420))
-        draw_text(win, "Press Q to Quit", 40, (200, 200, 200), (s_width/2 - 150, 470))
-        pygame.display.update()
-        
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                run = False
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_1:
-                    main(win, "Easy")
-                elif event.key == pygame.K_2:
-                    main(win, "Medium")
-                elif event.key == pygame.K_3:
-                    main(win, "Hard")
-                elif event.key == pygame.K_c:
-                    customization_menu(win)
-                elif event.key == pygame.K_q:
-                    run = False
-                    pygame.quit()
-                    sys.exit()
+    redraw = True
+    while True:
+        # Drawn on entry and after a game or the customization menu; in between the menu sleeps
+        if redraw:
+            # Only a save of this board size can be resumed
+            saved = get_saver().saved_game()
+            if saved and (saved.width, saved.height) != (board_columns, board_rows):
+                saved = None
+            draw_main_menu(win, saved)
+            startup_mark("first_menu_frame")
+        redraw = True
+        event = wait_for_key(win, ATTRACT_DELAY)
+        if event is None:
+            attract_mode(win)
+            continue
+        key = event.key
+        if key == pygame.K_1:
+            main(win, "Easy")
+        elif key == pygame.K_2:
+            main(win, "Medium")
+        elif key == pygame.K_3:
+            main(win, "Hard")
+        elif key == pygame.K_4:
+            main(win, "Easy", practice=True)
+        elif key == pygame.K_r and saved:
+            main(win, saved.difficulty, engine=saved)
+        elif key == pygame.K_c:
+            customization_menu(win)
+        elif key == pygame.K_q:
+            pygame.quit()
+            sys.exit()
+        else:
+            redraw = False
 
 # ------------------------- Entry Point ------------------------- #
-win = pygame.display.set_mode((s_width, s_height))
-pygame.display.set_caption('Tetris')
-main_menu(win)
\ No newline at end of file
+def board_dimension(text):
+    value = int(text)
+    if value < 4:
+        raise argparse.ArgumentTypeError("must be at least 4 (the longest piece)")
+    return value
+
+def cell_size(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError("must be at least 1 pixel")
+    return value
+
+def parse_args(argv=None):
+    """Parses the command-line options."""
+    parser = argparse.ArgumentParser(description="Tetris")
+    parser.add_argument("--cols", type=board_dimension, default=COLUMNS,
+                        help=f"board width in cells (default {COLUMNS})")
+    parser.add_argument("--rows", type=board_dimension, default=ROWS,
+                        help=f"board height in cells (default {ROWS})")
+    parser.add_argument("--cell", type=cell_size,
+                        help="cell size in pixels (default: 30, or smaller so the window fits the screen)")
+    parser.add_argument("--fps", type=int, default=RENDER_FPS,
+                        help=f"render frame cap, 0 for uncapped (default {RENDER_FPS})")
+    parser.add_argument("--das", type=int, default=DAS_MS, metavar="MS",
+                        help=f"delay before a held left/right key repeats (default {DAS_MS})")
+    parser.add_argument("--arr", type=int, default=ARR_MS, metavar="MS",
+                        help=f"time between repeats of a held key, 0 to slide to the wall (default {ARR_MS})")
+    parser.add_argument("--vsync", action="store_true",
+                        help="sync rendering to the display refresh instead of a frame cap")
+    parser.add_argument("--record", metavar="DIR",
+                        help="save a replay of every game to DIR (check them with replay.py verify)")
+    parser.add_argument("--profile", metavar="FILE", default=os.environ.get("TETRIS_PROFILE"),
+                        help="profile frame phases, show a HUD (F3) and write a CSV/JSON trace to FILE "
+                             "plus a Chrome trace next to it (also TETRIS_PROFILE=FILE)")
+    parser.add_argument("--spectate", metavar="[HOST:]PORT", nargs="?", const=str(SPECTATE_PORT),
+                        help=f"stream games to spectators (watch with spectate.py watch); default port {SPECTATE_PORT}")
+    parser.add_argument("--startup-report", metavar="FILE", nargs="?", const="-",
+                        help="report time to the first menu and game frames; "
+                             "print it, or append it to FILE as a JSON line")
+    return parser.parse_args(argv)
+
+def init_pygame():
+    """
+    Initializes only the pygame subsystems the game uses. pygame.init()
+    would also start audio, joysticks and the rest, which slows startup.
+    """
+    pygame.display.init()
+    pygame.font.init()
+
+def get_ticks():
+    """Milliseconds since launch (pygame.time.get_ticks() needs pygame.init())."""
+    return int((time.perf_counter() - _LAUNCH) * 1000)
+
+def now_ms():
+    """Like get_ticks() but with the fraction kept, for input timing."""
+    return (time.perf_counter() - _LAUNCH) * 1000
+
+WAKE_EVENTS = (pygame.KEYDOWN, pygame.KEYUP, pygame.QUIT)
+
+def wait_for_frame(deadline, since):
+    """
+    Sleeps until deadline (now_ms() time, None for no wait) but wakes as
+    soon as a key goes down or up, so input is handled when it arrives
+    rather than on the next frame. Returns the events with the time each
+    arrived: when the wait saw it come, or for events already queued (they
+    came while the last frame was being drawn) since, when the queue was
+    last emptied, the earliest they can have come. Input latency therefore
+    never counts from later than the input arrived.
+    """
+    queued = pygame.event.get()
+    events = [(event, since) for event in queued]
+    if deadline is None or any(event.type in WAKE_EVENTS for event in queued):
+        return events
+    while True:
+        remaining = deadline - now_ms()
+        if remaining <= 0:
+            break
+        # Rounded up: waking before a repeat is due would draw a frame for nothing
+        event = pygame.event.wait(math.ceil(remaining))
+        if event.type == pygame.NOEVENT:
+            break
+        arrived = now_ms()
+        events.append((event, arrived))
+        if event.type in WAKE_EVENTS:
+            # Along with anything queued right behind it
+            events.extend((event, arrived) for event in pygame.event.get())
+            break
+    return events
+
+_startup = {}
+
+def startup_mark(name):
+    """Records when name first happened, in ms since launch."""
+    if name not in _startup:
+        _startup[name] = round((time.perf_counter() - _LAUNCH) * 1000, 1)
+
+def write_startup_report():
+    """Reports the startup timings once, if --startup-report asked for them."""
+    if not STARTUP_REPORT or "reported" in _startup:
+        return
+    _startup["reported"] = True
+    report = {"time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    report.update({name + "_ms": ms for name, ms in _startup.items() if name != "reported"})
+    if "first_game_frame" in _startup:
+        # From choosing a difficulty, so time spent in the menu does not count
+        report["game_start_ms"] = round(_startup["first_game_frame"] - _startup["game_selected"], 1)
+    if STARTUP_REPORT == "-":
+        print("Startup: " + ", ".join(f"{name} {value}" for name, value in report.items() if name != "time"),
+              file=sys.stderr)
+    else:
+        with open(STARTUP_REPORT, "a") as f:
+            f.write(json.dumps(report) + "\n")
+
+def create_window(vsync=False):
+    """Opens the game window, optionally with vsync (needs a scaled window)."""
+    init_pygame()
+    if vsync:
+        win = pygame.display.set_mode((s_width, s_height), pygame.SCALED, vsync=1)
+    else:
+        win = pygame.display.set_mode((s_width, s_height))
+    pygame.display.set_caption('Tetris')
+    startup_mark("window")
+    return win
+
+if __name__ == "__main__":
+    args = parse_args()
+    # With vsync, display.update() paces the loop, so the frame cap is lifted
+    VSYNC = args.vsync
+    RENDER_FPS = 0 if VSYNC else args.fps
+    DAS, ARR = args.das, args.arr
+    REPLAY_DIR = args.record
+    STARTUP_REPORT = args.startup_report
+    if STARTUP_REPORT:
+        startup_mark("imports")
+        atexit.register(write_startup_report)  # in case no game is started
+    if args.profile:
+        PROFILE_PATH = args.profile
+        profiler = FrameProfiler()
+    cell = args.cell
+    if cell is None:
+        init_pygame()
+        cell = fit_cell_size(args.cols, args.rows, pygame.display.get_desktop_sizes()[0])
+    set_layout(args.cols, args.rows, cell)
+    if args.spectate:
+        from spectate import SpectatorServer
+        host, _, port = args.spectate.rpartition(":")
+        spectators = SpectatorServer(host, int(port))
+        spectators.start()
+        print(f"Spectators: python spectate.py watch {host or 'localhost'}:{spectators.port}")
+    win = create_window(VSYNC)
+    main_menu(win)
@@ -0,0 +1,226 @@
+"""
+Bot tournament runner.
+
+Plays seeded headless games with a placement policy across a process pool
+(one worker per core by default) and writes per-game stats plus a
+per-difficulty summary to one JSON file. Used to tune DIFFICULTY_SPEED and
+the speed-up rule:
+
+    python tournament.py --seeds 0-999 --policy greedy --out results.json
+    python tournament.py --speed Hard=0.15 --speed-up-step 0.01
+    python tournament.py --policy mybots:cautious
+    python tournament.py --policy search      # looks one piece ahead (solver.py)
+
+A policy is a function policy(engine, rng) returning the (rotation, x)
+placement for engine.current_piece; rng is a random.Random seeded per game.
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import engine
+from engine import TetrisEngine, NOOP, LEFT, RIGHT, DOWN, ROTATE
+from solver import Solver, placements, evaluate, LINE_WEIGHT, TOP_OUT_PENALTY
+
+# ------------------------- Policies ------------------------- #
+def greedy_policy(game, rng):
+    """Picks the placement with the best evaluate() score after clearing rows."""
+    best = None
+    for rotation, x, landed in placements(game.board, game.current_piece):
+        board = game.board.copy()
+        positions = board.place(landed)
+        rows, _ = board.clear_rows({y for _, y in positions})
+        score = evaluate(board) + LINE_WEIGHT * len(rows) - (TOP_OUT_PENALTY if board.topped_out else 0)
+        if best is None or score > best[0]:
+            best = (score, rotation, x)
+    if best is None:
+        return game.current_piece.rotation, game.current_piece.x
+    return best[1], best[2]
+
+_solver = None
+
+def search_policy(game, rng):
+    """Searches the current and next piece with solver.Solver (no deadline, so games are reproducible)."""
+    global _solver
+    if _solver is None:
+        _solver = Solver(deadline_ms=None)
+    plan = _solver.best(game.board, [game.current_piece, game.next_piece])
+    if plan is None:
+        return game.current_piece.rotation, game.current_piece.x
+    return plan.rotation, plan.x
+
+def random_policy(game, rng):
+    """Picks a uniformly random placement."""
+    options = [(rotation, x) for rotation, x, _ in placements(game.board, game.current_piece)]
+    if not options:
+        return game.current_piece.rotation, game.current_piece.x
+    return rng.choice(options)
+
+POLICIES = {
+    "greedy": greedy_policy,
+    "search": search_policy,
+    "random": random_policy,
+}
+
+def load_policy(name):
+    """Resolves a built-in policy name or a 'module:function' path."""
+    if name in POLICIES:
+        return POLICIES[name]
+    module, _, function = name.partition(":")
+    return getattr(importlib.import_module(module), function)
+
+# ------------------------- Games ------------------------- #
+class Steering:
+    """
+    Steers each piece to the placement the policy picks for it, one
+    action per next_action() call: rotate, slide to the column, then
+    soft-drop until it locks. Shared by play_game() and the replay
+    corpus recorder (replay.py), so both play the same way.
+    """
+
+    def __init__(self, policy, rng):
+        self.policy = policy
+        self.rng = rng
+        self.piece = None
+        self.target = None
+        self.state = None
+
+    def next_action(self, game):
+        piece = game.current_piece
+        if piece is not self.piece:
+            self.piece = piece
+            self.state = None
+            self.target = tuple(self.policy(game, self.rng))
+        state = (piece.rotation, piece.x)
+        if state == self.state:
+            # Blocked on the way; give up on the target and drop here
+            self.target = state
+        self.state = state
+        rotation, x = self.target
+        if piece.rotation != rotation:
+            return ROTATE
+        if piece.x != x:
+            return LEFT if piece.x > x else RIGHT
+        return DOWN
+
+def play_game(policy, difficulty, seed, actions_per_second=10, max_pieces=1000):
+    """
+    Plays one game and returns its stats. The bot makes one move every
+    1000 / actions_per_second ms of game time: it rotates, slides to its
+    chosen column, then soft-drops until the piece locks, so faster fall
+    speeds leave it less time to reach its target.
+    """
+    game = TetrisEngine(difficulty, seed)
+    steering = Steering(policy, random.Random(seed))
+    move_ms = 1000 / actions_per_second
+    while not game.game_over and game.pieces < max_pieces:
+        game.apply(steering.next_action(game))
+        game.step(NOOP, move_ms)
+    return {
+        "difficulty": difficulty,
+        "seed": seed,
+        "pieces": game.pieces,
+        "lines": game.lines,
+        "score": game.score,
+        "survival_s": round(game.elapsed / 1000, 3),
+        "topped_out": game.game_over,
+    }
+
+def _configure(speeds, speed_up_interval, speed_up_step):
+    """Applies the tuning overrides inside a worker process."""
+    engine.DIFFICULTY_SPEED.update(speeds)
+    engine.SPEED_UP_INTERVAL = speed_up_interval
+    engine.SPEED_UP_STEP = speed_up_step
+
+def _run(task):
+    policy_name, difficulty, seed, actions_per_second, max_pieces = task
+    return play_game(load_policy(policy_name), difficulty, seed, actions_per_second, max_pieces)
+
+def summarize(games):
+    """Averages the per-game stats for each difficulty."""
+    summary = {}
+    for difficulty in sorted({g["difficulty"] for g in games}, key=list(engine.DIFFICULTY_SPEED).index):
+        rows = [g for g in games if g["difficulty"] == difficulty]
+        summary[difficulty] = {"games": len(rows)}
+        for key in ("pieces", "lines", "score", "survival_s"):
+            summary[difficulty]["mean_" + key] = round(sum(g[key] for g in rows) / len(rows), 3)
+        summary[difficulty]["topped_out"] = sum(g["topped_out"] for g in rows)
+    return summary
+
+# ------------------------- Command Line ------------------------- #
+def parse_seeds(text):
+    """Parses '0-99' or '1,5,9' (or a mix, '0-9,42') into a list of seeds."""
+    seeds = []
+    for part in text.split(","):
+        if "-" in part:
+            start, end = part.split("-")
+            seeds.extend(range(int(start), int(end) + 1))
+        else:
+            seeds.append(int(part))
+    return seeds
+
+def parse_speed(text):
+    difficulty, _, value = text.partition("=")
+    if difficulty not in engine.DIFFICULTY_SPEED:
+        raise argparse.ArgumentTypeError(f"unknown difficulty {difficulty!r}")
+    return difficulty, float(value)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a seeded bot tournament across all cores.")
+    parser.add_argument("--seeds", type=parse_seeds, default=parse_seeds("0-99"),
+                        help="seed list such as 0-99 or 1,5,9 (default 0-99)")
+    parser.add_argument("--difficulty", nargs="+", choices=list(engine.DIFFICULTY_SPEED),
+                        default=list(engine.DIFFICULTY_SPEED))
+    parser.add_argument("--policy", default="greedy",
+                        help="built-in policy (%s) or module:function" % ", ".join(POLICIES))
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--aps", type=float, default=10, help="bot actions per second of game time")
+    parser.add_argument("--max-pieces", type=int, default=1000, help="stop a game after this many pieces")
+    parser.add_argument("--speed", type=parse_speed, action="append", default=[],
+                        metavar="DIFFICULTY=SECONDS", help="override a DIFFICULTY_SPEED entry")
+    parser.add_argument("--speed-up-interval", type=float, default=engine.SPEED_UP_INTERVAL,
+                        help="ms between fall-speed increases")
+    parser.add_argument("--speed-up-step", type=float, default=engine.SPEED_UP_STEP,
+                        help="seconds taken off the fall speed at each increase")
+    parser.add_argument("--out", default="tournament.json")
+    args = parser.parse_args(argv)
+
+    load_policy(args.policy)  # fail early on a bad policy name
+    tasks = [(args.policy, difficulty, seed, args.aps, args.max_pieces)
+             for difficulty in args.difficulty for seed in args.seeds]
+    config = (dict(args.speed), args.speed_up_interval, args.speed_up_step)
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.workers, initializer=_configure, initargs=config) as pool:
+        games = list(pool.imap_unordered(_run, tasks, chunksize=max(1, len(tasks) // (args.workers * 8))))
+    elapsed = time.perf_counter() - start
+
+    # Sort so the file only depends on the seeds, not on worker scheduling
+    order = list(engine.DIFFICULTY_SPEED)
+    games.sort(key=lambda g: (order.index(g["difficulty"]), g["seed"]))
+    _configure(*config)
+    results = {
+        "policy": args.policy,
+        "actions_per_second": args.aps,
+        "max_pieces": args.max_pieces,
+        "difficulty_speed": {d: engine.DIFFICULTY_SPEED[d] for d in args.difficulty},
+        "speed_up_interval": args.speed_up_interval,
+        "speed_up_step": args.speed_up_step,
+        "summary": summarize(games),
+        "games": games,
+    }
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+
+    for difficulty, stats in results["summary"].items():
+        print(f"{difficulty:>6}: {stats['games']} games, mean score {stats['mean_score']}, "
+              f"mean survival {stats['mean_survival_s']}s")
+    print(f"{len(games)} games in {elapsed:.1f}s with {args.workers} workers -> {args.out}")
+
+if __name__ == "__main__":
+    sys.exit(main())